@@ -12,7 +12,7 @@ for the Todo application. It provides functionality to:
 import os
 import json
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
@@ -20,11 +20,13 @@ from googleapiclient.errors import HttpError
 
 
 class CalendarIntegration:
-    def __init__(self):
-        """Initialize the calendar integration"""
-        self.credentials_file = "calendar_credentials.json"
-        self.oauth_config_file = "oauth_config.json"
+    def __init__(self, directory: str = "."):
+        """Initialize the calendar integration with credential files stored in directory"""
+        self.directory = directory
+        self.credentials_file = os.path.join(directory, "calendar_credentials.json")
+        self.oauth_config_file = os.path.join(directory, "oauth_config.json")
         self.scopes = ['https://www.googleapis.com/auth/calendar']
+        self.batch_size = 50
         self.credentials = None
         self.service = None
         
@@ -56,6 +58,7 @@ class CalendarIntegration:
             }
             
             # Save OAuth config
+            os.makedirs(self.directory, exist_ok=True)
             with open(self.oauth_config_file, 'w') as f:
                 json.dump(oauth_config, f)
             
@@ -130,6 +133,7 @@ class CalendarIntegration:
             'scopes': credentials.scopes
         }
         
+        os.makedirs(self.directory, exist_ok=True)
         with open(self.credentials_file, 'w') as f:
             json.dump(creds_data, f)
     
@@ -228,6 +232,50 @@ class CalendarIntegration:
                 "error": f"Connection failed: {str(e)}"
             }
     
+    def _get_timezone(self) -> str:
+        """Detect the timezone to use for calendar events"""
+        # Get proper timezone - try multiple methods for best compatibility
+        try:
+            # Method 1: Try to get system timezone
+            import time
+            import os
+            
+            # Check for Asia/Kolkata (IST) timezone
+            if time.tzname[0] == 'IST' or time.tzname[1] == 'IST':
+                timezone = 'Asia/Kolkata'
+            else:
+                # Fallback to reading system timezone
+                timezone = os.popen('timedatectl show -p Timezone --value').read().strip()
+                if not timezone:
+                    timezone = 'Asia/Kolkata'  # Default for IST
+        except:
+            # Ultimate fallback
+            timezone = 'Asia/Kolkata'
+        
+        return timezone
+    
+    def _build_event(self, todo_title: str, start_time: datetime, end_time: datetime,
+                     description: str, timezone: str) -> Dict[str, Any]:
+        """Build the Calendar API event body for a completed todo"""
+        # Calculate duration
+        duration = end_time - start_time
+        duration_str = self._format_duration(duration)
+        
+        # Create event with proper timezone
+        return {
+            'summary': f"{todo_title}",
+            'description': f"{description}\n\nDuration: {duration_str}",
+            'start': {
+                'dateTime': start_time.isoformat(),
+                'timeZone': timezone,
+            },
+            'end': {
+                'dateTime': end_time.isoformat(),
+                'timeZone': timezone,
+            },
+            'colorId': '2',  # Green color for completed tasks
+        }
+    
     def create_calendar_event(self, todo_title: str, start_time: datetime, 
                             end_time: datetime, description: str = "") -> bool:
         """
@@ -246,42 +294,8 @@ class CalendarIntegration:
             return False
         
         try:
-            # Calculate duration
-            duration = end_time - start_time
-            duration_str = self._format_duration(duration)
-            
-            # Get proper timezone - try multiple methods for best compatibility
-            try:
-                # Method 1: Try to get system timezone
-                import time
-                import os
-                
-                # Check for Asia/Kolkata (IST) timezone
-                if time.tzname[0] == 'IST' or time.tzname[1] == 'IST':
-                    timezone = 'Asia/Kolkata'
-                else:
-                    # Fallback to reading system timezone
-                    timezone = os.popen('timedatectl show -p Timezone --value').read().strip()
-                    if not timezone:
-                        timezone = 'Asia/Kolkata'  # Default for IST
-            except:
-                # Ultimate fallback
-                timezone = 'Asia/Kolkata'
-            
-            # Create event with proper timezone
-            event = {
-                'summary': f"{todo_title}",
-                'description': f"{description}\n\nDuration: {duration_str}",
-                'start': {
-                    'dateTime': start_time.isoformat(),
-                    'timeZone': timezone,
-                },
-                'end': {
-                    'dateTime': end_time.isoformat(),
-                    'timeZone': timezone,
-                },
-                'colorId': '2',  # Green color for completed tasks
-            }
+            timezone = self._get_timezone()
+            event = self._build_event(todo_title, start_time, end_time, description, timezone)
             
             print(f"Creating calendar event in timezone: {timezone}")
             print(f"Start time: {start_time.isoformat()}")
@@ -300,6 +314,55 @@ class CalendarIntegration:
             print(f"Failed to create calendar event: {str(e)}")
             return False
     
+    def create_calendar_events(self, events: List[Dict[str, Any]]) -> int:
+        """
+        Create calendar events for several completed todos using batched API requests
+        
+        Args:
+            events: List of dictionaries with the create_calendar_event arguments
+                (todo_title, start_time, end_time and optional description)
+            
+        Returns:
+            Number of events created successfully
+        """
+        if not self.is_configured() or not events:
+            return 0
+        
+        created = []
+        
+        def _on_response(request_id, response, exception):
+            if exception is not None:
+                print(f"Calendar batch request {request_id} failed: {exception}")
+            else:
+                created.append(response.get('id'))
+        
+        try:
+            timezone = self._get_timezone()
+            print(f"Creating {len(events)} calendar events in timezone: {timezone}")
+            
+            # The Calendar API accepts at most 50 calls per batch request
+            for start in range(0, len(events), self.batch_size):
+                batch = self.service.new_batch_http_request(callback=_on_response)
+                for event in events[start:start + self.batch_size]:
+                    body = self._build_event(
+                        event['todo_title'],
+                        event['start_time'],
+                        event['end_time'],
+                        event.get('description', ""),
+                        timezone
+                    )
+                    batch.add(self.service.events().insert(calendarId='primary', body=body))
+                batch.execute()
+            
+            print(f"Calendar batch created {len(created)} of {len(events)} events")
+            
+        except HttpError as e:
+            print(f"Calendar API error: {e.resp.status}")
+        except Exception as e:
+            print(f"Failed to create calendar events: {str(e)}")
+        
+        return len(created)
+    
     def _format_duration(self, duration: timedelta) -> str:
         """Format duration as human-readable string"""
         total_seconds = int(duration.total_seconds())
@@ -339,7 +402,3 @@ class CalendarIntegration:
             
         except Exception as e:
             print(f"Failed to disconnect calendar: {str(e)}")
-
-
-# Global instance
-calendar_integration = CalendarIntegration()
\ No newline at end of file
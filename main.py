@@ -1,14 +1,26 @@
-from fastapi import FastAPI, Request, Form, HTTPException, Cookie
+from fastapi import FastAPI, Request, Form, HTTPException, Cookie, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
-import uuid
+from typing import List, Optional, Iterator, Tuple
+from datetime import datetime, timedelta
+from dateutil.rrule import rrulestr
+from itertools import islice
+from urllib.parse import urlencode
+import json
+import os
+import re
+import asyncio
 
-# Import calendar integration
-from calendar_integration import calendar_integration
+# Import partitions - each workspace's list has its own store, settings, calendar and archive
+from partitions import Partition, PartitionManager, DEFAULT_USER, DEFAULT_LIST, is_valid_name
+
+# Import secondary index sort options for faceted filtering
+from todo_index import SORT_FIELDS
+
+# Import request tracing - ids come from next_id so recorded traces replay deterministically
+from request_tracing import TraceRecorder, TraceMiddleware, next_id
 
 # Initialize FastAPI app
 app = FastAPI(title="Todo App", description="A simple sequencing todo application with subtodos, themes, and calendar integration")
@@ -16,15 +28,33 @@ app = FastAPI(title="Todo App", description="A simple sequencing todo applicatio
 # Setup templates directory for HTML rendering
 templates = Jinja2Templates(directory="templates")
 
-# In-memory storage for todos (in production, use a database)
-todos_db = []
-
-# User settings storage (in production, use a database)
-user_settings = {
+# Settings for a newly created partition
+DEFAULT_USER_SETTINGS = {
     "calendar_enabled": False,
-    "theme": "ocean"
+    "theme": "ocean",
+    "archive_after_days": int(os.environ.get("TODO_ARCHIVE_AFTER_DAYS", "30"))
 }
 
+# Cookies selecting the current workspace ("user") and list - names, not logins.
+# Workspaces are not authenticated: whoever picks a name uses that list and its calendar.
+USER_COOKIE = "todo_user"
+LIST_COOKIE = "todo_list"
+
+# Optional request trace recording for capacity testing (enabled by TODO_TRACE_FILE)
+trace_recorder = TraceRecorder.from_env()
+if trace_recorder:
+    app.add_middleware(TraceMiddleware, recorder=trace_recorder, cookie_names=(USER_COOKIE, LIST_COOKIE))
+
+# The main page triggers an archive sweep at most this often
+ARCHIVE_SWEEP_INTERVAL = timedelta(hours=1)
+
+# Maximum archived trees shown per /archive page
+ARCHIVE_PAGE_SIZE = 200
+
+# Default and maximum number of todos returned by a filtered view
+FILTER_PAGE_SIZE = 100
+FILTER_MAX_PAGE_SIZE = 1000
+
 # Available themes configuration
 THEMES = {
     "ocean": {"name": "Ocean Blue"},
@@ -49,50 +79,149 @@ class Todo(BaseModel):
     completed_at: Optional[datetime] = None  # Track completion time
     parent_id: Optional[str] = None
     level: int = 0
+    recurrence_id: Optional[str] = None  # Set on the single materialized occurrence of a recurring todo
+    due_at: Optional[datetime] = None
+    restored_at: Optional[datetime] = None  # Restoring from the archive restarts the archive age
+
+class RecurrenceTemplate(BaseModel):
+    """
+    Template record for a recurring todo - only the current open occurrence lives in todos_db
+    """
+    id: str
+    title: str
+    rule: str  # RRULE string, e.g. "FREQ=DAILY"
+    dtstart: datetime
+    completed_count: int = 0
+
+# Deepest nesting level the main page renders (main todos and their subtodos)
+MAX_TODO_LEVEL = 1
+
+# Shorthand recurrence names accepted by the add-todo form
+RECURRENCE_PRESETS = {
+    "daily": "FREQ=DAILY",
+    "weekly": "FREQ=WEEKLY"
+}
+
+# Frequencies accepted in custom recurrence rules - sub-daily rules are rejected
+RECURRENCE_FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+
+# Rule parts accepted in custom recurrence rules. Filters that can combine into a rule
+# matching no date at all (BYMONTH, BYYEARDAY, BYSETPOS, ...) are rejected, because
+# dateutil only finds out after scanning every period up to the year 9999.
+RECURRENCE_RULE_PARTS = {"FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY", "BYMONTHDAY", "WKST"}
+RECURRENCE_MAX_INTERVAL = 366
+RECURRENCE_WEEKDAY_PATTERN = re.compile(r"^([+-]?[1-4])?(MO|TU|WE|TH|FR|SA|SU)$")
 
 class TodoCreate(BaseModel):
     """Model for creating new todos - only requires title"""
     title: str
 
-def get_next_sequence(parent_id: Optional[str] = None) -> int:
+# Modified partitions are written to disk at most this many seconds after a change
+PARTITION_SAVE_INTERVAL = float(os.environ.get("TODO_SAVE_INTERVAL", "2"))
+
+# Partitions live under TODO_DATA_DIR; idle ones beyond TODO_MAX_PARTITIONS are evicted to disk
+partitions = PartitionManager(
+    data_dir=os.environ.get("TODO_DATA_DIR", "data"),
+    max_partitions=int(os.environ.get("TODO_MAX_PARTITIONS", "32")),
+    todo_model=Todo,
+    template_model=RecurrenceTemplate,
+    default_settings=DEFAULT_USER_SETTINGS
+)
+
+async def get_partition(request: Request):
+    """
+    Resolve the current workspace's list from cookies, keeping it in memory for the whole request.
+    Any request other than GET marks the partition for saving.
+    """
+    user = request.cookies.get(USER_COOKIE, DEFAULT_USER)
+    list_name = request.cookies.get(LIST_COOKIE, DEFAULT_LIST)
+    if not is_valid_name(user) or not is_valid_name(list_name):
+        raise HTTPException(status_code=400, detail="Invalid user or list name")
+    
+    partition = partitions.acquire(user, list_name)
+    try:
+        yield partition
+    finally:
+        partitions.release(partition, modified=request.method != "GET")
+
+def get_next_sequence(partition: Partition, parent_id: Optional[str] = None) -> int:
     """
     Calculate the next sequence number for new todos
     """
     if parent_id:
-        sibling_todos = [todo for todo in todos_db if todo.parent_id == parent_id]
+        sibling_todos = [todo for todo in partition.todos_db if todo.parent_id == parent_id]
         if not sibling_todos:
             return 1
         return max(todo.sequence for todo in sibling_todos) + 1
     else:
-        main_todos = [todo for todo in todos_db if todo.parent_id is None]
+        main_todos = [todo for todo in partition.todos_db if todo.parent_id is None]
         if not main_todos:
             return 1
         return max(todo.sequence for todo in main_todos) + 1
 
-def reorder_sequences(parent_id: Optional[str] = None):
+def reorder_sequences(partition: Partition, parent_id: Optional[str] = None):
     """
     Reorder todo sequences to be consecutive
     """
     if parent_id:
-        todos_to_reorder = [todo for todo in todos_db if todo.parent_id == parent_id]
+        todos_to_reorder = [todo for todo in partition.todos_db if todo.parent_id == parent_id]
     else:
-        todos_to_reorder = [todo for todo in todos_db if todo.parent_id is None]
+        todos_to_reorder = [todo for todo in partition.todos_db if todo.parent_id is None]
     
     sorted_todos = sorted(todos_to_reorder, key=lambda x: x.sequence)
     for i, todo in enumerate(sorted_todos, 1):
         todo.sequence = i
 
-def get_subtodos(parent_id: str) -> List[Todo]:
+def get_subtodos(partition: Partition, parent_id: str) -> List[Todo]:
     """Get all subtodos for a given parent todo, sorted by sequence"""
-    subtodos = [todo for todo in todos_db if todo.parent_id == parent_id]
+    subtodos = [todo for todo in partition.todos_db if todo.parent_id == parent_id]
     return sorted(subtodos, key=lambda x: x.sequence)
 
-def check_and_update_parent_completion(parent_id: str):
+def find_todo(partition: Partition, todo_id: str) -> Optional[Todo]:
+    """Find a todo by id"""
+    for todo in partition.todos_db:
+        if todo.id == todo_id:
+            return todo
+    return None
+
+def get_subtree(partition: Partition, root: Todo) -> List[Todo]:
     """
-    Check if all subtodos are completed and auto-complete parent if so
+    Get a todo followed by all of its descendants, walking only that branch through the index
+    """
+    subtree = [root]
+    for todo in subtree:
+        subtree.extend(partition.todo_index.children(todo.id))
+    return subtree
+
+def completion_event(todo: Todo, summary: str) -> dict:
+    """Build the calendar event arguments for a completed todo"""
+    return {
+        "todo_title": todo.title,
+        "start_time": todo.created_at,
+        "end_time": todo.completed_at,
+        "description": f"{summary}\nCreated: {todo.created_at.strftime('%Y-%m-%d %H:%M')}"
+    }
+
+def send_calendar_events(partition: Partition, events: list):
+    """Send queued calendar events as one batch if calendar integration is enabled"""
+    if not events:
+        return
+    if partition.user_settings.get("calendar_enabled", False) and partition.calendar_integration.is_configured():
+        try:
+            if len(events) == 1:
+                partition.calendar_integration.create_calendar_event(**events[0])
+            else:
+                partition.calendar_integration.create_calendar_events(events)
+        except Exception as e:
+            print(f"Calendar batch creation failed: {e}")
+
+def check_and_update_parent_completion(partition: Partition, parent_id: str, pending_events: Optional[list] = None):
+    """
+    Check if all subtodos are completed and auto-complete parent if so.
+    When pending_events is given the parent's calendar event is queued there instead of sent.
     """
     parent_todo = None
-    for todo in todos_db:
+    for todo in partition.todos_db:
         if todo.id == parent_id:
             parent_todo = todo
             break
@@ -100,7 +229,7 @@ def check_and_update_parent_completion(parent_id: str):
     if not parent_todo:
         return
     
-    subtodos = get_subtodos(parent_id)
+    subtodos = get_subtodos(partition, parent_id)
     if not subtodos:
         return
     
@@ -112,81 +241,420 @@ def check_and_update_parent_completion(parent_id: str):
         parent_todo.completed = True
         parent_todo.completed_at = datetime.now()
         
-        # Create calendar event for parent todo if enabled
-        if user_settings.get("calendar_enabled", False) and calendar_integration.is_configured():
-            try:
-                calendar_integration.create_calendar_event(
-                    todo_title=parent_todo.title,
-                    start_time=parent_todo.created_at,
-                    end_time=parent_todo.completed_at,
-                    description=f"Parent task completed via Todo App\nAll {len(subtodos)} subtodos completed\nCreated: {parent_todo.created_at.strftime('%Y-%m-%d %H:%M')}"
-                )
-            except Exception as e:
-                print(f"Calendar event creation failed for parent todo: {e}")
+        # Create calendar event for parent todo - queued when the caller batches events
+        event = completion_event(
+            parent_todo,
+            f"Parent task completed via Todo App\nAll {len(subtodos)} subtodos completed"
+        )
+        if pending_events is not None:
+            pending_events.append(event)
+        else:
+            send_calendar_events(partition, [event])
     elif not all_completed and parent_todo.completed:
         parent_todo.completed = False
         parent_todo.completed_at = None
+    
+    partition.todo_index.update(parent_todo)
 
-def get_hierarchical_todos():
+def check_recurrence_parts(rule: str):
+    """
+    Reject recurrence rules that could take dateutil a long scan to expand.
+    Accepted rules always reach their next occurrence within a few periods of their frequency.
+    """
+    parts = {}
+    for part in rule.split(";"):
+        name, separator, value = part.partition("=")
+        if not separator:
+            raise HTTPException(status_code=400, detail=f"Invalid recurrence rule part: {part}")
+        parts[name.strip().upper()] = value.strip().upper()
+    
+    unsupported = set(parts) - RECURRENCE_RULE_PARTS
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported recurrence rule parts: {', '.join(sorted(unsupported))}")
+    
+    frequency = parts.get("FREQ")
+    if frequency not in RECURRENCE_FREQUENCIES:
+        raise HTTPException(status_code=400, detail="Recurrence FREQ must be DAILY, WEEKLY, MONTHLY or YEARLY")
+    
+    interval = parts.get("INTERVAL", "1")
+    if not interval.isdigit() or not 1 <= int(interval) <= RECURRENCE_MAX_INTERVAL:
+        raise HTTPException(status_code=400, detail=f"Recurrence INTERVAL must be 1-{RECURRENCE_MAX_INTERVAL}")
+    
+    weekdays = parts["BYDAY"].split(",") if "BYDAY" in parts else []
+    month_days = parts["BYMONTHDAY"].split(",") if "BYMONTHDAY" in parts else []
+    if any(not RECURRENCE_WEEKDAY_PATTERN.match(day) for day in weekdays):
+        raise HTTPException(status_code=400, detail="Recurrence BYDAY must list weekdays, optionally numbered -4 to 4")
+    if any(not day.lstrip("+-").isdigit() or not 1 <= abs(int(day)) <= 28 for day in month_days):
+        raise HTTPException(status_code=400, detail="Recurrence BYMONTHDAY must be between -28 and 28 (not 0)")
+    
+    # These filter combinations can exclude every date the frequency produces
+    if weekdays and month_days:
+        raise HTTPException(status_code=400, detail="Recurrence rules cannot combine BYDAY and BYMONTHDAY")
+    if frequency == "WEEKLY" and month_days:
+        raise HTTPException(status_code=400, detail="Weekly recurrence rules cannot use BYMONTHDAY")
+    if frequency == "DAILY" and int(interval) != 1 and (weekdays or month_days):
+        raise HTTPException(status_code=400, detail="Daily recurrence rules with an INTERVAL cannot use BYDAY or BYMONTHDAY")
+
+def parse_recurrence_rule(recurrence: str, dtstart: datetime) -> str:
+    """
+    Normalize a preset name or RRULE string and validate it against dtstart
+    """
+    rule = RECURRENCE_PRESETS.get(recurrence.strip().lower(), recurrence.strip())
+    if rule.upper().startswith("RRULE:"):
+        rule = rule[len("RRULE:"):]
+    check_recurrence_parts(rule)
+    try:
+        rrulestr(rule, dtstart=dtstart)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid recurrence rule: {e}")
+    return rule
+
+def iter_occurrences(template: RecurrenceTemplate, after: Optional[datetime] = None) -> Iterator[datetime]:
+    """
+    Lazily yield occurrence times of a recurring todo, optionally only those after a given time
+    """
+    rule = rrulestr(template.rule, dtstart=template.dtstart)
+    if after is None:
+        yield from rule
+    else:
+        yield from rule.xafter(after)
+
+def advance_recurring_todo(partition: Partition, occurrence: Todo) -> bool:
+    """
+    Replace a completed occurrence with the next open one in place.
+    Returns False when the series is exhausted and the completed occurrence should stay.
+    """
+    template = partition.recurrence_templates.get(occurrence.recurrence_id)
+    if not template:
+        return False
+    
+    template.completed_count += 1
+    
+    # Skip occurrences missed while the todo was overdue
+    after = max(occurrence.due_at or template.dtstart, datetime.now())
+    next_due = next(iter_occurrences(template, after=after), None)
+    if next_due is None:
+        del partition.recurrence_templates[template.id]
+        occurrence.recurrence_id = None
+        return False
+    
+    # The occurrence gets a new id, so it is re-indexed rather than updated
+    partition.todo_index.remove(occurrence)
+    occurrence.id = next_id()
+    occurrence.completed = False
+    occurrence.completed_at = None
+    occurrence.created_at = datetime.now()
+    occurrence.due_at = next_due
+    partition.todo_index.add(occurrence)
+    return True
+
+def get_hierarchical_todos(partition: Partition):
     """
     Get todos organized hierarchically
     """
-    main_todos = [todo for todo in todos_db if todo.parent_id is None]
+    main_todos = [todo for todo in partition.todos_db if todo.parent_id is None]
     main_todos = sorted(main_todos, key=lambda x: x.sequence)
     
     result = []
     for main_todo in main_todos:
-        subtodos = get_subtodos(main_todo.id)
+        subtodos = get_subtodos(partition, main_todo.id)
         result.append((main_todo, subtodos))
     
     return result
 
+def archive_completed_todos(partition: Partition, now: Optional[datetime] = None) -> int:
+    """
+    Move completed top-level trees older than archive_after_days into the archive.
+    Returns the number of trees archived.
+    """
+    now = now or datetime.now()
+    cutoff = now - timedelta(days=partition.user_settings.get("archive_after_days", 30))
+    
+    trees = []
+    archived_ids = set()
+    for todo in partition.todos_db:
+        if todo.parent_id is not None or not todo.completed or todo.recurrence_id:
+            continue
+        if max(todo.completed_at, todo.restored_at or todo.completed_at) > cutoff:
+            continue
+        
+        subtree = get_subtree(partition, todo)
+        if not all(subtodo.completed for subtodo in subtree):
+            continue
+        
+        trees.append({
+            "completed_at": todo.completed_at.isoformat(),
+            "root": json.loads(todo.json()),
+            "subtodos": [json.loads(subtodo.json()) for subtodo in subtree[1:]]
+        })
+        archived_ids.update(subtodo.id for subtodo in subtree)
+    
+    if not trees:
+        return 0
+    
+    # Write the cold tier first so a failed write never loses todos, then save the hot tier
+    # straight away - the store records the archive size so a crash in between is recovered
+    partition.todo_archive.append_trees(trees)
+    for todo in partition.todos_db:
+        if todo.id in archived_ids:
+            partition.todo_index.remove(todo)
+    partition.todos_db = [todo for todo in partition.todos_db if todo.id not in archived_ids]
+    reorder_sequences(partition, None)
+    partitions.save(partition)
+    return len(trees)
+
+def maybe_archive_completed_todos(partition: Partition):
+    """Run an archive sweep if the last one is older than ARCHIVE_SWEEP_INTERVAL"""
+    now = datetime.now()
+    if partition.last_archive_sweep and now - partition.last_archive_sweep < ARCHIVE_SWEEP_INTERVAL:
+        return
+    partition.last_archive_sweep = now
+    
+    try:
+        archived = archive_completed_todos(partition, now)
+        if archived:
+            print(f"Archived {archived} completed todos")
+    except OSError as e:
+        print(f"Archive sweep failed: {e}")
+
+def parse_date(value: Optional[str], default: datetime) -> datetime:
+    """Parse a YYYY-MM-DD query parameter"""
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+
+def parse_archive_cursor(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Parse an archive paging cursor of the form <segment>:<entry>"""
+    if not value:
+        return None
+    segment, _, entry = value.rpartition(":")
+    if not segment or not entry.isdigit():
+        raise HTTPException(status_code=400, detail=f"Invalid archive cursor: {value}")
+    return segment, int(entry)
+
+def parse_flag(value: Optional[str], name: str) -> Optional[bool]:
+    """Parse an optional yes/no query parameter"""
+    if not value:
+        return None
+    if value.lower() in ("1", "true", "yes"):
+        return True
+    if value.lower() in ("0", "false", "no"):
+        return False
+    raise HTTPException(status_code=400, detail=f"Invalid value for {name}: {value}")
+
+def get_todo_filters(
+    status: Optional[str] = None,
+    level: Optional[str] = None,
+    has_open_subtodos: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    completed_from: Optional[str] = None,
+    completed_to: Optional[str] = None,
+    sort: Optional[str] = None
+) -> dict:
+    """
+    Parse faceted filter query parameters into TodoIndex.query arguments.
+    Empty values (as sent by the filter form) mean "no filter"; date ranges are inclusive days.
+    """
+    filters = {}
+    
+    if status:
+        if status not in ("open", "completed"):
+            raise HTTPException(status_code=400, detail="Status must be open or completed")
+        filters["completed"] = status == "completed"
+    
+    if level:
+        if not level.isdigit():
+            raise HTTPException(status_code=400, detail=f"Invalid level: {level}")
+        filters["level"] = int(level)
+    
+    open_subtodos = parse_flag(has_open_subtodos, "has_open_subtodos")
+    if open_subtodos is not None:
+        filters["has_open_subtodos"] = open_subtodos
+    
+    end_of_day = timedelta(days=1, microseconds=-1)
+    if created_from:
+        filters["created_from"] = parse_date(created_from, None)
+    if created_to:
+        filters["created_to"] = parse_date(created_to, None) + end_of_day
+    if completed_from:
+        filters["completed_from"] = parse_date(completed_from, None)
+    if completed_to:
+        filters["completed_to"] = parse_date(completed_to, None) + end_of_day
+    
+    if sort:
+        if sort.lstrip("-") not in SORT_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Invalid sort: {sort}")
+        filters["sort"] = sort
+    
+    return filters
+
+def filter_todos(partition: Partition, filters: dict, limit: int, offset: int) -> dict:
+    """
+    Run a faceted query against the partition's secondary indexes and return one page
+    """
+    if not 1 <= limit <= FILTER_MAX_PAGE_SIZE or offset < 0:
+        raise HTTPException(status_code=400, detail=f"limit must be 1-{FILTER_MAX_PAGE_SIZE} and offset >= 0")
+    
+    # Ask for one extra todo to know whether another page exists
+    matches = partition.todo_index.query(limit=offset + limit + 1, **filters)
+    return {
+        "todos": matches[offset:offset + limit],
+        "has_more": len(matches) > offset + limit,
+        "offset": offset,
+        "limit": limit
+    }
+
+def page_url(request: Request, **paging) -> str:
+    """URL of another page of the current filtered view, replacing its paging parameters"""
+    params = dict(request.query_params)
+    for name, value in paging.items():
+        if value is None:
+            params.pop(name, None)
+        else:
+            params[name] = str(value)
+    return f"{request.url.path}?{urlencode(params)}"
+
+def sequence_label(partition: Partition, todo: Todo) -> str:
+    """Display sequence such as 2.3 for a todo shown outside its hierarchy"""
+    labels = [str(todo.sequence)]
+    parent = partition.todo_index.get(todo.parent_id) if todo.parent_id else None
+    while parent is not None:
+        labels.append(str(parent.sequence))
+        parent = partition.todo_index.get(parent.parent_id) if parent.parent_id else None
+    return ".".join(reversed(labels))
+
+def todo_state() -> dict:
+    """
+    Snapshot of every partition's todos without wall-clock fields, used to verify trace replays
+    """
+    state = {}
+    for user, list_name in partitions.keys():
+        partition = partitions.get(user, list_name)
+        todos = [
+            todo.dict(exclude={"created_at", "completed_at", "due_at", "restored_at"})
+            for todo in partition.todos_db
+        ]
+        state[partition.key] = sorted(todos, key=lambda x: x["id"])
+    return state
+
 def get_user_theme(request: Request) -> str:
     """Get user's current theme from cookie or default"""
     theme = request.cookies.get("theme", "blue_gradient")
     return theme if theme in THEMES else "blue_gradient"
 
 @app.get("/", response_class=HTMLResponse)
-async def read_todos(request: Request):
+async def read_todos(
+    request: Request,
+    filters: dict = Depends(get_todo_filters),
+    limit: int = FILTER_PAGE_SIZE,
+    offset: int = 0,
+    partition: Partition = Depends(get_partition)
+):
     """
-    Main page endpoint - displays all todos in hierarchical order with theme support
+    Main page endpoint - displays all todos in hierarchical order with theme support,
+    or a flat page of matching todos when filters are given
     """
-    hierarchical_todos = get_hierarchical_todos()
+    maybe_archive_completed_todos(partition)
+    
+    filtered = None
+    hierarchical_todos = []
+    if filters:
+        filtered = filter_todos(partition, filters, limit, offset)
+        filtered["todos"] = [(sequence_label(partition, todo), todo) for todo in filtered["todos"]]
+        filtered["previous_url"] = page_url(request, offset=max(offset - limit, 0)) if offset > 0 else None
+        filtered["next_url"] = page_url(request, offset=offset + limit) if filtered["has_more"] else None
+    else:
+        hierarchical_todos = get_hierarchical_todos(partition)
     
     return templates.TemplateResponse(
         "index.html", 
         {
             "request": request, 
             "hierarchical_todos": hierarchical_todos, 
+            "filtered": filtered,
             "current_time": datetime.now(),
-            "calendar_enabled": user_settings.get("calendar_enabled", False),
-            "calendar_connected": calendar_integration.is_configured()
+            "calendar_enabled": partition.user_settings.get("calendar_enabled", False),
+            "calendar_connected": partition.calendar_integration.is_configured(),
+            "theme": partition.user_settings.get("theme", "ocean"),
+            "current_user": partition.user,
+            "current_list": partition.list_name,
+            "list_names": partitions.list_names(partition.user)
         }
     )
 
+@app.get("/api/todos")
+async def list_todos(
+    filters: dict = Depends(get_todo_filters),
+    limit: int = FILTER_PAGE_SIZE,
+    offset: int = 0,
+    partition: Partition = Depends(get_partition)
+):
+    """
+    JSON API - todos matching the faceted filters, served from the secondary indexes
+    """
+    return filter_todos(partition, filters, limit, offset)
+
 @app.post("/set-theme/{theme_name}")
-async def set_theme(theme_name: str):
+async def set_theme(theme_name: str, partition: Partition = Depends(get_partition)):
     """Set user theme preference"""
     if theme_name not in THEMES:
         raise HTTPException(status_code=400, detail="Invalid theme")
     
+    partition.user_settings["theme"] = theme_name
     response = RedirectResponse(url="/", status_code=303)
     response.set_cookie(key="theme", value=theme_name, max_age=365*24*3600)  # 1 year
     return response
 
+@app.post("/switch-list")
+async def switch_list(list_name: str = Form(...)):
+    """Switch to another named list, creating it on first use"""
+    list_name = list_name.strip()
+    if not is_valid_name(list_name):
+        raise HTTPException(status_code=400, detail="List names may only contain letters, digits, - and _")
+    
+    response = RedirectResponse(url="/", status_code=303)
+    response.set_cookie(key=LIST_COOKIE, value=list_name, max_age=365*24*3600)
+    return response
+
+@app.post("/switch-user")
+async def switch_user(user_name: str = Form(...)):
+    """Switch to another user's partitions, starting on their default list"""
+    user_name = user_name.strip()
+    if not is_valid_name(user_name):
+        raise HTTPException(status_code=400, detail="User names may only contain letters, digits, - and _")
+    
+    response = RedirectResponse(url="/", status_code=303)
+    response.set_cookie(key=USER_COOKIE, value=user_name, max_age=365*24*3600)
+    response.set_cookie(key=LIST_COOKIE, value=DEFAULT_LIST, max_age=365*24*3600)
+    return response
+
 @app.post("/add-todo")
-async def add_todo(title: str = Form(...), parent_id: Optional[str] = Form(None)):
+async def add_todo(
+    title: str = Form(...),
+    parent_id: Optional[str] = Form(None),
+    recurrence: Optional[str] = Form(None),
+    partition: Partition = Depends(get_partition)
+):
     """
-    Add a new todo to the list
+    Add a new todo to the list, optionally recurring (daily, weekly or an RRULE)
     """
     if not title.strip():
         raise HTTPException(status_code=400, detail="Todo title cannot be empty")
     
+    if recurrence and recurrence.strip():
+        if parent_id:
+            raise HTTPException(status_code=400, detail="Subtodos cannot recur")
+        return add_recurring_todo(partition, title.strip(), recurrence)
+    
     # Determine level based on parent
     level = 0
     if parent_id:
         parent_todo = None
-        for todo in todos_db:
+        for todo in partition.todos_db:
             if todo.id == parent_id:
                 parent_todo = todo
                 break
@@ -194,28 +662,62 @@ async def add_todo(title: str = Form(...), parent_id: Optional[str] = Form(None)
         if not parent_todo:
             raise HTTPException(status_code=404, detail="Parent todo not found")
         
+        if parent_todo.recurrence_id:
+            raise HTTPException(status_code=400, detail="Recurring todos cannot have subtodos")
+        
         level = parent_todo.level + 1
     
     new_todo = Todo(
-        id=str(uuid.uuid4()),
+        id=next_id(),
         title=title.strip(),
         completed=False,
-        sequence=get_next_sequence(parent_id),
+        sequence=get_next_sequence(partition, parent_id),
         created_at=datetime.now(),
         parent_id=parent_id,
         level=level
     )
     
-    todos_db.append(new_todo)
+    partition.todos_db.append(new_todo)
+    partition.todo_index.add(new_todo)
+    return RedirectResponse(url="/", status_code=303)
+
+def add_recurring_todo(partition: Partition, title: str, recurrence: str):
+    """
+    Create a recurrence template and materialize only its first occurrence
+    """
+    now = datetime.now().replace(microsecond=0)
+    template = RecurrenceTemplate(
+        id=next_id(),
+        title=title,
+        rule=parse_recurrence_rule(recurrence, now),
+        dtstart=now
+    )
+    
+    first_due = next(iter_occurrences(template), None)
+    if first_due is None:
+        raise HTTPException(status_code=400, detail="Recurrence rule has no occurrences")
+    
+    partition.recurrence_templates[template.id] = template
+    occurrence = Todo(
+        id=next_id(),
+        title=title,
+        completed=False,
+        sequence=get_next_sequence(partition, None),
+        created_at=now,
+        recurrence_id=template.id,
+        due_at=first_due
+    )
+    partition.todos_db.append(occurrence)
+    partition.todo_index.add(occurrence)
     return RedirectResponse(url="/", status_code=303)
 
 @app.post("/toggle-todo/{todo_id}")
-async def toggle_todo(todo_id: str):
+async def toggle_todo(todo_id: str, partition: Partition = Depends(get_partition)):
     """
     Toggle completion status with calendar integration
     """
     current_todo = None
-    for todo in todos_db:
+    for todo in partition.todos_db:
         if todo.id == todo_id:
             current_todo = todo
             break
@@ -225,7 +727,7 @@ async def toggle_todo(todo_id: str):
     
     # If this is a main todo with subtodos, prevent manual completion
     if current_todo.parent_id is None:
-        subtodos = get_subtodos(current_todo.id)
+        subtodos = get_subtodos(partition, current_todo.id)
         if subtodos and not current_todo.completed:
             return RedirectResponse(url="/", status_code=303)
     
@@ -236,8 +738,8 @@ async def toggle_todo(todo_id: str):
     # Debug logging
     print(f"Todo toggle - ID: {current_todo.id}, Title: {current_todo.title}")
     print(f"Was completed: {was_completed}, Now completed: {current_todo.completed}")
-    print(f"Calendar enabled: {user_settings.get('calendar_enabled', False)}")
-    print(f"Calendar configured: {calendar_integration.is_configured()}")
+    print(f"Calendar enabled: {partition.user_settings.get('calendar_enabled', False)}")
+    print(f"Calendar configured: {partition.calendar_integration.is_configured()}")
     
     # Handle completion time and calendar integration
     if current_todo.completed and not was_completed:
@@ -245,14 +747,14 @@ async def toggle_todo(todo_id: str):
         current_todo.completed_at = datetime.now()
         
         # Create calendar event if enabled
-        if user_settings.get("calendar_enabled", False) and calendar_integration.is_configured():
+        if partition.user_settings.get("calendar_enabled", False) and partition.calendar_integration.is_configured():
             try:
                 # For main todos without subtodos, create immediate calendar event
                 if current_todo.parent_id is None:
-                    subtodos = get_subtodos(current_todo.id)
+                    subtodos = get_subtodos(partition, current_todo.id)
                     if not subtodos:  # Main todo with no subtodos
                         print(f"Creating calendar event for standalone main todo: {current_todo.title}")
-                        calendar_integration.create_calendar_event(
+                        partition.calendar_integration.create_calendar_event(
                             todo_title=current_todo.title,
                             start_time=current_todo.created_at,
                             end_time=current_todo.completed_at,
@@ -262,7 +764,7 @@ async def toggle_todo(todo_id: str):
                 else:
                     # For subtodos, create immediate calendar event
                     print(f"Creating calendar event for subtodo: {current_todo.title}")
-                    calendar_integration.create_calendar_event(
+                    partition.calendar_integration.create_calendar_event(
                         todo_title=current_todo.title,
                         start_time=current_todo.created_at,
                         end_time=current_todo.completed_at,
@@ -272,53 +774,61 @@ async def toggle_todo(todo_id: str):
             except Exception as e:
                 print(f"Calendar event creation failed: {e}")
     
+        # Recurring todos roll over to their next occurrence instead of piling up completed rows
+        if current_todo.recurrence_id:
+            advance_recurring_todo(partition, current_todo)
+    
     elif not current_todo.completed and was_completed:
         # Uncompleted
         current_todo.completed_at = None
     
+    partition.todo_index.update(current_todo)
+    
     # If this is a subtodo, update parent completion status
     if current_todo.parent_id:
-        check_and_update_parent_completion(current_todo.parent_id)
+        check_and_update_parent_completion(partition, current_todo.parent_id)
     
     return RedirectResponse(url="/", status_code=303)
 
 @app.post("/delete-todo/{todo_id}")
-async def delete_todo(todo_id: str):
+async def delete_todo(todo_id: str, partition: Partition = Depends(get_partition)):
     """
     Delete a todo and reorder remaining sequences
     """
-    global todos_db
-    
-    todo_to_delete = None
-    for todo in todos_db:
-        if todo.id == todo_id:
-            todo_to_delete = todo
-            break
+    todo_to_delete = find_todo(partition, todo_id)
     
     if not todo_to_delete:
         raise HTTPException(status_code=404, detail="Todo not found")
     
-    parent_id = todo_to_delete.parent_id
+    remove_subtree(partition, todo_to_delete)
+    return RedirectResponse(url="/", status_code=303)
+
+def remove_subtree(partition: Partition, root: Todo):
+    """
+    Remove a todo with all of its descendants, then fix up the parent once
+    """
+    subtree = get_subtree(partition, root)
+    for todo in subtree:
+        partition.todo_index.remove(todo)
     
-    if todo_to_delete.parent_id is None:
-        # Deleting a main todo - also delete all its subtodos
-        todos_db = [todo for todo in todos_db if todo.id != todo_id and todo.parent_id != todo_id]
-        reorder_sequences(None)
-    else:
-        # Deleting a subtodo
-        todos_db = [todo for todo in todos_db if todo.id != todo_id]
-        reorder_sequences(parent_id)
-        check_and_update_parent_completion(parent_id)
+    subtree_ids = {todo.id for todo in subtree}
+    partition.todos_db = [todo for todo in partition.todos_db if todo.id not in subtree_ids]
     
-    return RedirectResponse(url="/", status_code=303)
+    # Deleting an occurrence ends its recurring series
+    if root.recurrence_id:
+        partition.recurrence_templates.pop(root.recurrence_id, None)
+    
+    reorder_sequences(partition, root.parent_id)
+    if root.parent_id:
+        check_and_update_parent_completion(partition, root.parent_id)
 
 @app.post("/move-up/{todo_id}")
-async def move_todo_up(todo_id: str):
+async def move_todo_up(todo_id: str, partition: Partition = Depends(get_partition)):
     """
     Move a todo up in sequence
     """
     current_todo = None
-    for todo in todos_db:
+    for todo in partition.todos_db:
         if todo.id == todo_id:
             current_todo = todo
             break
@@ -327,22 +837,23 @@ async def move_todo_up(todo_id: str):
         return RedirectResponse(url="/", status_code=303)
     
     # Find sibling todo with sequence one less than current
-    for todo in todos_db:
+    for todo in partition.todos_db:
         if (todo.parent_id == current_todo.parent_id and 
             todo.sequence == current_todo.sequence - 1):
             # Swap sequences
             todo.sequence, current_todo.sequence = current_todo.sequence, todo.sequence
+            partition.todo_index.reposition(current_todo)
             break
     
     return RedirectResponse(url="/", status_code=303)
 
 @app.post("/move-down/{todo_id}")
-async def move_todo_down(todo_id: str):
+async def move_todo_down(todo_id: str, partition: Partition = Depends(get_partition)):
     """
     Move a todo down in sequence
     """
     current_todo = None
-    for todo in todos_db:
+    for todo in partition.todos_db:
         if todo.id == todo_id:
             current_todo = todo
             break
@@ -351,36 +862,236 @@ async def move_todo_down(todo_id: str):
         return RedirectResponse(url="/", status_code=303)
     
     # Get max sequence for siblings
-    siblings = [todo for todo in todos_db if todo.parent_id == current_todo.parent_id]
+    siblings = [todo for todo in partition.todos_db if todo.parent_id == current_todo.parent_id]
     max_sequence = max(todo.sequence for todo in siblings) if siblings else 0
     
     if current_todo.sequence >= max_sequence:
         return RedirectResponse(url="/", status_code=303)
     
     # Find sibling todo with sequence one more than current
-    for todo in todos_db:
+    for todo in partition.todos_db:
         if (todo.parent_id == current_todo.parent_id and 
             todo.sequence == current_todo.sequence + 1):
             # Swap sequences
             todo.sequence, current_todo.sequence = current_todo.sequence, todo.sequence
+            partition.todo_index.reposition(current_todo)
             break
     
     return RedirectResponse(url="/", status_code=303)
 
+# Subtree Bulk Endpoints
+
+@app.post("/complete-subtree/{todo_id}")
+async def complete_subtree(todo_id: str, partition: Partition = Depends(get_partition)):
+    """
+    Complete a todo and all of its descendants, sending their calendar events as one batch
+    """
+    root = find_todo(partition, todo_id)
+    if not root:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    
+    root_was_open = not root.completed
+    completed_at = datetime.now()
+    pending_events = []
+    
+    for todo in get_subtree(partition, root):
+        if todo.completed:
+            continue
+        todo.completed = True
+        todo.completed_at = completed_at
+        partition.todo_index.update(todo)
+        kind = "Main task" if todo.parent_id is None else "Subtask"
+        pending_events.append(completion_event(todo, f"{kind} completed via Todo App"))
+    
+    if root.parent_id:
+        check_and_update_parent_completion(partition, root.parent_id, pending_events)
+    
+    send_calendar_events(partition, pending_events)
+    
+    if root.recurrence_id and root_was_open:
+        advance_recurring_todo(partition, root)
+    
+    return RedirectResponse(url="/", status_code=303)
+
+@app.post("/reopen-subtree/{todo_id}")
+async def reopen_subtree(todo_id: str, partition: Partition = Depends(get_partition)):
+    """
+    Reopen a todo and all of its descendants
+    """
+    root = find_todo(partition, todo_id)
+    if not root:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    
+    for todo in get_subtree(partition, root):
+        todo.completed = False
+        todo.completed_at = None
+        partition.todo_index.update(todo)
+    
+    if root.parent_id:
+        check_and_update_parent_completion(partition, root.parent_id)
+    
+    return RedirectResponse(url="/", status_code=303)
+
+@app.post("/delete-subtree/{todo_id}")
+async def delete_subtree(todo_id: str, partition: Partition = Depends(get_partition)):
+    """
+    Delete a todo and its whole branch
+    """
+    root = find_todo(partition, todo_id)
+    if not root:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    
+    remove_subtree(partition, root)
+    return RedirectResponse(url="/", status_code=303)
+
+@app.post("/move-subtree/{todo_id}")
+async def move_subtree(
+    todo_id: str,
+    new_parent_id: Optional[str] = Form(None),
+    partition: Partition = Depends(get_partition)
+):
+    """
+    Re-parent a todo and its whole branch - an empty new_parent_id makes it a main todo
+    """
+    root = find_todo(partition, todo_id)
+    if not root:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    
+    new_parent_id = new_parent_id or None
+    new_level = 0
+    if new_parent_id:
+        new_parent = find_todo(partition, new_parent_id)
+        if not new_parent:
+            raise HTTPException(status_code=404, detail="Parent todo not found")
+        if new_parent.recurrence_id:
+            raise HTTPException(status_code=400, detail="Recurring todos cannot have subtodos")
+        if root.recurrence_id:
+            raise HTTPException(status_code=400, detail="Subtodos cannot recur")
+        new_level = new_parent.level + 1
+    
+    subtree = get_subtree(partition, root)
+    if new_parent_id in {todo.id for todo in subtree}:
+        raise HTTPException(status_code=400, detail="Cannot move a todo into its own subtree")
+    
+    level_shift = new_level - root.level
+    if max(todo.level for todo in subtree) + level_shift > MAX_TODO_LEVEL:
+        raise HTTPException(status_code=400, detail="Move would nest todos deeper than supported")
+    
+    old_parent_id = root.parent_id
+    if old_parent_id == new_parent_id:
+        return RedirectResponse(url="/", status_code=303)
+    
+    root.sequence = get_next_sequence(partition, new_parent_id)
+    root.parent_id = new_parent_id
+    for todo in subtree:
+        todo.level += level_shift
+        partition.todo_index.update(todo)
+    
+    reorder_sequences(partition, old_parent_id)
+    
+    pending_events = []
+    if old_parent_id:
+        check_and_update_parent_completion(partition, old_parent_id, pending_events)
+    if new_parent_id:
+        check_and_update_parent_completion(partition, new_parent_id, pending_events)
+    send_calendar_events(partition, pending_events)
+    
+    return RedirectResponse(url="/", status_code=303)
+
+# Archive Endpoints
+
+@app.get("/archive", response_class=HTMLResponse)
+async def archive_page(
+    request: Request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    after: Optional[str] = None,
+    partition: Partition = Depends(get_partition)
+):
+    """
+    Display archived todo trees completed within a date range, reading only matching segments.
+    Pages continue after the last tree shown, so later pages skip the segments already listed.
+    """
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = parse_date(start, today - timedelta(days=90))
+    end_date = parse_date(end, today)
+    
+    # Include the whole end day
+    matches = partition.todo_archive.iter_trees(start_date, end_date + timedelta(days=1, microseconds=-1),
+                                                parse_archive_cursor(after))
+    page = list(islice(matches, ARCHIVE_PAGE_SIZE + 1))
+    has_more = len(page) > ARCHIVE_PAGE_SIZE
+    
+    archived_trees = [
+        (
+            segment,
+            tree["entry"],
+            Todo(**tree["root"]),
+            sorted((Todo(**subtodo) for subtodo in tree["subtodos"]), key=lambda x: x.sequence)
+        )
+        for segment, tree in page[:ARCHIVE_PAGE_SIZE]
+    ]
+    
+    return templates.TemplateResponse(
+        "archive.html",
+        {
+            "request": request,
+            "archived_trees": archived_trees,
+            "has_more": has_more,
+            "first_url": page_url(request, after=None) if after else None,
+            "next_url": page_url(request, after=f"{archived_trees[-1][0]}:{archived_trees[-1][1]}") if has_more else None,
+            "start": start_date,
+            "end": end_date,
+            "archive_stats": partition.todo_archive.stats(),
+            "archive_after_days": partition.user_settings.get("archive_after_days", 30)
+        }
+    )
+
+@app.post("/archive/sweep")
+async def sweep_archive(partition: Partition = Depends(get_partition)):
+    """Archive old completed todos now instead of waiting for the next scheduled sweep"""
+    archive_completed_todos(partition)
+    return RedirectResponse(url="/archive", status_code=303)
+
+@app.post("/archive/restore/{segment}/{entry}")
+async def restore_archived_todo(segment: str, entry: int, partition: Partition = Depends(get_partition)):
+    """
+    Move an archived todo tree back into the hot store as the last main todo
+    """
+    tree = partition.todo_archive.read_tree(segment, entry)
+    if not tree:
+        raise HTTPException(status_code=404, detail="Archived todo not found")
+    
+    root = Todo(**tree["root"])
+    root.sequence = get_next_sequence(partition, None)
+    root.restored_at = datetime.now()
+    
+    restored = [root] + [Todo(**subtodo) for subtodo in tree["subtodos"]]
+    partition.todos_db.extend(restored)
+    for todo in restored:
+        partition.todo_index.add(todo)
+    
+    # Only stop listing the tree once the hot tier holding it is on disk
+    partition.pending_restores.append([segment, entry])
+    partitions.save(partition)
+    partition.todo_archive.mark_restored(segment, entry)
+    partition.pending_restores.clear()
+    return RedirectResponse(url="/", status_code=303)
+
 # Calendar Integration Endpoints
 
 @app.get("/integrations", response_class=HTMLResponse)
-async def integrations_page(request: Request):
+async def integrations_page(request: Request, partition: Partition = Depends(get_partition)):
     """Display integrations configuration page"""
-    calendar_status = calendar_integration.test_connection()
+    calendar_status = partition.calendar_integration.test_connection()
     
     return templates.TemplateResponse(
         "integrations.html",
         {
             "request": request,
-            "calendar_configured": calendar_integration.is_configured(),
+            "calendar_configured": partition.calendar_integration.is_configured(),
             "calendar_status": calendar_status,
-            "calendar_enabled": user_settings.get("calendar_enabled", False)
+            "calendar_enabled": partition.user_settings.get("calendar_enabled", False)
         }
     )
 
@@ -388,17 +1099,18 @@ async def integrations_page(request: Request):
 async def setup_calendar(
     client_id: str = Form(...),
     client_secret: str = Form(...),
-    redirect_uri: str = Form(default="http://localhost:8000/calendar/callback")
+    redirect_uri: str = Form(default="http://localhost:8000/calendar/callback"),
+    partition: Partition = Depends(get_partition)
 ):
     """Setup Google Calendar OAuth configuration"""
     try:
-        result = calendar_integration.set_oauth_config(client_id, client_secret, redirect_uri)
+        result = partition.calendar_integration.set_oauth_config(client_id, client_secret, redirect_uri)
         return RedirectResponse(url=result["authorization_url"], status_code=303)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Setup failed: {str(e)}")
 
 @app.get("/calendar/callback")
-async def calendar_callback(code: str = None, error: str = None):
+async def calendar_callback(code: str = None, error: str = None, partition: Partition = Depends(get_partition)):
     """Handle Google Calendar OAuth callback"""
     if error:
         return RedirectResponse(url="/integrations?error=oauth_denied", status_code=303)
@@ -406,44 +1118,73 @@ async def calendar_callback(code: str = None, error: str = None):
     if not code:
         return RedirectResponse(url="/integrations?error=no_code", status_code=303)
     
-    success = calendar_integration.handle_oauth_callback(code, "http://localhost:8000/calendar/callback")
+    success = partition.calendar_integration.handle_oauth_callback(code, "http://localhost:8000/calendar/callback")
     
     if success:
-        user_settings["calendar_enabled"] = True
+        partition.user_settings["calendar_enabled"] = True
+        partition.dirty = True  # GET request that changes settings
         return RedirectResponse(url="/integrations?success=calendar_connected", status_code=303)
     else:
         return RedirectResponse(url="/integrations?error=oauth_failed", status_code=303)
 
 @app.post("/calendar/toggle")
-async def toggle_calendar():
+async def toggle_calendar(partition: Partition = Depends(get_partition)):
     """Toggle calendar integration on/off"""
-    user_settings["calendar_enabled"] = not user_settings.get("calendar_enabled", False)
+    partition.user_settings["calendar_enabled"] = not partition.user_settings.get("calendar_enabled", False)
     return RedirectResponse(url="/integrations", status_code=303)
 
 @app.post("/calendar/disconnect")
-async def disconnect_calendar():
+async def disconnect_calendar(partition: Partition = Depends(get_partition)):
     """Disconnect calendar integration"""
-    calendar_integration.disconnect()
-    user_settings["calendar_enabled"] = False
+    partition.calendar_integration.disconnect()
+    partition.user_settings["calendar_enabled"] = False
     return RedirectResponse(url="/integrations?success=calendar_disconnected", status_code=303)
 
 @app.get("/calendar/test")
-async def test_calendar():
+async def test_calendar(partition: Partition = Depends(get_partition)):
     """Test calendar connection"""
-    status = calendar_integration.test_connection()
+    status = partition.calendar_integration.test_connection()
     return status
 
 # Health check endpoint
 @app.get("/health")
-async def health_check():
+async def health_check(partition: Partition = Depends(get_partition)):
     """Simple health check endpoint"""
     return {
         "status": "healthy", 
-        "todos_count": len(todos_db),
-        "calendar_enabled": user_settings.get("calendar_enabled", False),
-        "calendar_connected": calendar_integration.is_configured()
+        "user": partition.user,
+        "list": partition.list_name,
+        "partitions_loaded": partitions.loaded_count,
+        "todos_count": len(partition.todos_db),
+        "recurring_count": len(partition.recurrence_templates),
+        "archived_count": partition.todo_archive.stats()["trees"],
+        "calendar_enabled": partition.user_settings.get("calendar_enabled", False),
+        "calendar_connected": partition.calendar_integration.is_configured()
     }
 
+async def save_modified_partitions():
+    """Write modified partitions every PARTITION_SAVE_INTERVAL so a crash loses little"""
+    while True:
+        await asyncio.sleep(PARTITION_SAVE_INTERVAL)
+        try:
+            partitions.save_all()
+        except OSError as e:
+            print(f"Saving partitions failed: {e}")
+
+@app.on_event("startup")
+async def start_partition_saver():
+    """Start the periodic partition saver"""
+    app.state.partition_saver = asyncio.create_task(save_modified_partitions())
+
+@app.on_event("shutdown")
+async def save_partitions():
+    """Stop the periodic saver and write modified partitions to disk"""
+    app.state.partition_saver.cancel()
+    if trace_recorder:
+        # Write the final state to the trace so replays can be verified
+        trace_recorder.write_snapshot(todo_state())
+    partitions.save_all()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=9000)
@@ -0,0 +1,228 @@
+"""
+Partition Storage Module
+
+This module splits the Todo application into independent partitions, one
+per named workspace ("user") and list. It provides functionality to:
+- Give each partition its own todo store, secondary indexes, sequence
+  space, settings, calendar credentials and archive
+- Persist modified partitions to disk as JSON
+- Keep recently used partitions in memory and evict idle ones (LRU)
+- Reload evicted partitions on demand
+"""
+
+import os
+import re
+import json
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+from calendar_integration import CalendarIntegration
+from todo_archive import TodoArchive
+from todo_index import TodoIndex
+
+
+DEFAULT_USER = "default"
+DEFAULT_LIST = "default"
+
+# User and list names become directory names, so keep them to a safe alphabet
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def is_valid_name(name: str) -> bool:
+    """Check that a user or list name is safe to use as a directory name"""
+    return bool(name and NAME_PATTERN.match(name))
+
+
+class Partition:
+    def __init__(self, user: str, list_name: str, directory: str, todos_db: list,
+                 recurrence_templates: dict, user_settings: Dict[str, Any]):
+        """Hold all state for one workspace's list"""
+        self.user = user
+        self.list_name = list_name
+        self.directory = directory
+        self.todos_db = todos_db
+        self.todo_index = TodoIndex(todos_db)
+        self.recurrence_templates = recurrence_templates
+        self.user_settings = user_settings
+        self.calendar_integration = CalendarIntegration(directory)
+        self.todo_archive = TodoArchive(os.path.join(directory, "archive"))
+        self.last_archive_sweep = None
+        self.active_requests = 0
+        self.pending_restores = []  # [segment, entry] pairs restored but not yet marked in the archive
+        self.dirty = False  # Changed since it was last saved
+
+    @property
+    def key(self) -> str:
+        """Identifier used for the LRU cache and state snapshots"""
+        return f"{self.user}/{self.list_name}"
+
+    def recover_archive(self, archive_appended: Optional[int], pending_restores: List[List[Any]]):
+        """
+        Reconcile the store with the archive after a crash between writing one and saving the other
+
+        Args:
+            archive_appended: Archive size when the store was last saved
+            pending_restores: Restores the saved store already contains but the archive may still list
+        """
+        for segment_name, entry in pending_restores:
+            self.todo_archive.mark_restored(segment_name, entry)
+        if pending_restores:
+            self.dirty = True
+
+        if archive_appended is None or self.todo_archive.appended_count <= archive_appended:
+            return
+
+        # Trees archived after the last save are still in the stale store - drop them
+        archived_ids = set()
+        for tree in self.todo_archive.iter_appended_since(archive_appended):
+            archived_ids.add(tree["root"]["id"])
+            archived_ids.update(subtodo["id"] for subtodo in tree["subtodos"])
+        for todo in self.todos_db:
+            if todo.id in archived_ids:
+                self.todo_index.remove(todo)
+        self.todos_db[:] = [todo for todo in self.todos_db if todo.id not in archived_ids]
+
+        # Close the gaps left in main todo sequences, as the archive sweep does
+        main_todos = sorted((todo for todo in self.todos_db if todo.parent_id is None), key=lambda todo: todo.sequence)
+        for sequence, todo in enumerate(main_todos, 1):
+            todo.sequence = sequence
+        self.dirty = True
+
+
+class PartitionManager:
+    def __init__(self, data_dir: str, max_partitions: int, todo_model, template_model,
+                 default_settings: Dict[str, Any]):
+        """
+        Initialize the partition manager
+
+        Args:
+            data_dir: Directory holding one sub-directory per user and list
+            max_partitions: Partitions kept in memory before idle ones are evicted
+            todo_model: Model class used to load stored todos
+            template_model: Model class used to load stored recurrence templates
+            default_settings: Settings for a newly created partition
+        """
+        self.data_dir = data_dir
+        self.max_partitions = max_partitions
+        self.todo_model = todo_model
+        self.template_model = template_model
+        self.default_settings = default_settings
+        self._partitions = OrderedDict()
+
+    def _directory(self, user: str, list_name: str) -> str:
+        """Directory of a partition"""
+        return os.path.join(self.data_dir, user, list_name)
+
+    def _store_file(self, directory: str) -> str:
+        """Store file inside a partition directory"""
+        return os.path.join(directory, "store.json")
+
+    def get(self, user: str, list_name: str) -> Partition:
+        """
+        Get a partition, loading it from disk or creating it if it is not in memory
+        """
+        key = f"{user}/{list_name}"
+        partition = self._partitions.get(key)
+        if partition is not None:
+            self._partitions.move_to_end(key)
+            return partition
+
+        partition = self._load(user, list_name)
+        self._partitions[key] = partition
+        self._evict_idle()
+        return partition
+
+    def acquire(self, user: str, list_name: str) -> Partition:
+        """Get a partition and protect it from eviction until released"""
+        partition = self.get(user, list_name)
+        partition.active_requests += 1
+        return partition
+
+    def release(self, partition: Partition, modified: bool = False):
+        """Allow a partition to be evicted again, marking it for saving if the request changed it"""
+        if modified:
+            partition.dirty = True
+        partition.active_requests -= 1
+
+    def _evict_idle(self):
+        """Save (if modified) and drop least recently used partitions beyond max_partitions"""
+        for key in list(self._partitions):
+            if len(self._partitions) <= self.max_partitions:
+                break
+            partition = self._partitions[key]
+            if partition.active_requests > 0:
+                continue
+            if partition.dirty:
+                self.save(partition)
+            del self._partitions[key]
+
+    def _load(self, user: str, list_name: str) -> Partition:
+        """Load a partition from its store file, or create an empty one"""
+        directory = self._directory(user, list_name)
+        store_file = self._store_file(directory)
+
+        todos_db = []
+        recurrence_templates = {}
+        user_settings = dict(self.default_settings)
+        store = {}
+
+        if os.path.exists(store_file):
+            with open(store_file, 'r') as f:
+                store = json.load(f)
+            todos_db = [self.todo_model(**todo) for todo in store.get("todos", [])]
+            for template in store.get("recurrence_templates", []):
+                template = self.template_model(**template)
+                recurrence_templates[template.id] = template
+            user_settings.update(store.get("user_settings", {}))
+
+        partition = Partition(user, list_name, directory, todos_db, recurrence_templates, user_settings)
+        partition.recover_archive(store.get("archive_appended"), store.get("pending_restores", []))
+        return partition
+
+    def save(self, partition: Partition):
+        """Atomically write a partition's store file"""
+        os.makedirs(partition.directory, exist_ok=True)
+        store = {
+            "todos": [json.loads(todo.json()) for todo in partition.todos_db],
+            "recurrence_templates": [
+                json.loads(template.json()) for template in partition.recurrence_templates.values()
+            ],
+            "user_settings": partition.user_settings,
+            "archive_appended": partition.todo_archive.appended_count,
+            "pending_restores": partition.pending_restores
+        }
+
+        store_file = self._store_file(partition.directory)
+        temp_file = store_file + ".tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(store, f)
+        os.replace(temp_file, store_file)
+        partition.dirty = False
+
+    def save_all(self):
+        """Write every modified in-memory partition to disk"""
+        for partition in list(self._partitions.values()):
+            if partition.dirty:
+                self.save(partition)
+
+    def list_names(self, user: str) -> List[str]:
+        """Names of all lists a user has, in memory or on disk"""
+        names = {partition.list_name for partition in self._partitions.values() if partition.user == user}
+        user_dir = os.path.join(self.data_dir, user)
+        if os.path.isdir(user_dir):
+            names.update(name for name in os.listdir(user_dir) if is_valid_name(name))
+        return sorted(names)
+
+    def keys(self) -> List[Tuple[str, str]]:
+        """All (user, list) pairs, in memory or on disk"""
+        pairs = {(partition.user, partition.list_name) for partition in self._partitions.values()}
+        if os.path.isdir(self.data_dir):
+            for user in os.listdir(self.data_dir):
+                if is_valid_name(user):
+                    pairs.update((user, list_name) for list_name in self.list_names(user))
+        return sorted(pairs)
+
+    @property
+    def loaded_count(self) -> int:
+        """Number of partitions currently held in memory"""
+        return len(self._partitions)
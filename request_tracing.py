@@ -0,0 +1,367 @@
+"""
+Request Trace Recording & Replay Module
+
+This module records real usage of the Todo application and replays it
+for capacity testing. It provides functionality to:
+- Record every request (endpoint, params, timing) as compact JSON lines,
+  leaving out credentials
+- Record the ids generated by each request so replays are deterministic
+- Replay a trace against a fresh in-process app at 1x, 10x or full speed
+- Report latency distributions and verify the final todo state of every partition
+
+Recording is enabled by setting the TODO_TRACE_FILE environment variable
+before starting the app; each run starts a new trace. Replay a trace with:
+
+    python request_tracing.py trace.jsonl --speed 10
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+import importlib
+from urllib.parse import parse_qsl, urlencode
+from http.cookies import SimpleCookie
+from collections import deque, defaultdict
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Tuple
+
+
+TRACE_FILE_ENV = "TODO_TRACE_FILE"
+DATA_DIR_ENV = "TODO_DATA_DIR"
+
+# Endpoints that talk to Google - recorded without query or body, and never replayed
+CREDENTIAL_PATH_PREFIXES = ("/calendar", "/integrations")
+
+# Form and query fields whose values are replaced before they reach the trace
+REDACTED_FIELDS = {"client_id", "client_secret", "code", "state", "token", "access_token", "refresh_token", "password"}
+REDACTED = "REDACTED"
+
+_ID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+# Ids generated while recording / ids to hand out while replaying the current request
+_recorded_ids: ContextVar[Optional[list]] = ContextVar("recorded_ids", default=None)
+_replay_ids: ContextVar[Optional[deque]] = ContextVar("replay_ids", default=None)
+
+
+def next_id() -> str:
+    """
+    Generate a new todo id, recording it for the trace or reusing the recorded one on replay
+    """
+    replay_ids = _replay_ids.get()
+    if replay_ids:
+        return replay_ids.popleft()
+
+    new_id = str(uuid.uuid4())
+    recorded_ids = _recorded_ids.get()
+    if recorded_ids is not None:
+        recorded_ids.append(new_id)
+    return new_id
+
+
+def endpoint_name(method: str, path: str) -> str:
+    """Collapse ids in a path so latencies group per endpoint"""
+    return f"{method} {_ID_PATTERN.sub('{id}', path)}"
+
+
+def redact_params(params: str) -> str:
+    """Replace the values of credential fields in a urlencoded query string or form body"""
+    pairs = parse_qsl(params, keep_blank_values=True)
+    if not any(name.lower() in REDACTED_FIELDS for name, _ in pairs):
+        return params
+    return urlencode([(name, REDACTED if name.lower() in REDACTED_FIELDS else value) for name, value in pairs])
+
+
+class TraceRecorder:
+    def __init__(self, trace_file: str):
+        """
+        Start a new trace file, one JSON object per line.
+        The file is truncated so one trace always holds a single run and its final snapshot.
+        """
+        self.trace_file = trace_file
+        self.started = time.perf_counter()
+        self._file = open(trace_file, 'w', buffering=1)
+
+    @classmethod
+    def from_env(cls) -> Optional["TraceRecorder"]:
+        """Create a recorder if TODO_TRACE_FILE is set, otherwise None"""
+        trace_file = os.environ.get(TRACE_FILE_ENV)
+        return cls(trace_file) if trace_file else None
+
+    def record(self, entry: Dict[str, Any]):
+        """Append a request entry to the trace"""
+        self._file.write(json.dumps(entry, separators=(',', ':')) + "\n")
+
+    def write_snapshot(self, state: List[Dict[str, Any]]):
+        """Append the final store state so replays can be verified against it"""
+        self.record({"snapshot": state})
+        self._file.flush()
+
+
+class TraceMiddleware:
+    """
+    ASGI middleware recording each HTTP request to a TraceRecorder.
+    Implemented at the ASGI level so form bodies can be captured without consuming them.
+    Only the named cookies are recorded; credential endpoints and fields are left out.
+    """
+
+    def __init__(self, app, recorder: TraceRecorder, cookie_names: Tuple[str, ...] = ()):
+        self.app = app
+        self.recorder = recorder
+        self.cookie_names = cookie_names
+
+    def _recorded_cookies(self, cookie_header: bytes) -> str:
+        """Keep only the cookies that select application state, e.g. the current list"""
+        cookies = SimpleCookie()
+        cookies.load(cookie_header.decode("latin-1"))
+        return "; ".join(f"{name}={cookies[name].value}" for name in self.cookie_names if name in cookies)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        status = {"code": 0}
+
+        async def receive_and_capture():
+            message = await receive()
+            if message["type"] == "http.request":
+                body.extend(message.get("body", b""))
+            return message
+
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        generated_ids = []
+        token = _recorded_ids.set(generated_ids)
+        offset = time.perf_counter() - self.recorder.started
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_and_capture, send_and_capture)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            _recorded_ids.reset(token)
+
+            entry = {
+                "t": round(offset, 4),
+                "m": scope["method"],
+                "p": scope["path"],
+                "s": status["code"],
+                "d": round(duration_ms, 3)
+            }
+            headers = dict(scope.get("headers", []))
+            credential_path = scope["path"].startswith(CREDENTIAL_PATH_PREFIXES)
+            if scope.get("query_string") and not credential_path:
+                entry["q"] = redact_params(scope["query_string"].decode("latin-1"))
+            if headers.get(b"cookie"):
+                # Cookies select the partition
+                cookies = self._recorded_cookies(headers[b"cookie"])
+                if cookies:
+                    entry["k"] = cookies
+            if body and not credential_path:
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                entry["b"] = body.decode("utf-8", errors="replace")
+                if content_type.startswith("application/x-www-form-urlencoded"):
+                    entry["b"] = redact_params(entry["b"])
+                entry["c"] = content_type
+            if generated_ids:
+                entry["ids"] = generated_ids
+            self.recorder.record(entry)
+
+
+def load_trace(trace_file: str) -> Tuple[List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+    """
+    Load request entries and the last recorded state snapshot from a trace file
+    """
+    entries = []
+    snapshot = None
+    with open(trace_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if "snapshot" in entry:
+                snapshot = entry["snapshot"]
+            else:
+                entries.append(entry)
+    return entries, snapshot
+
+
+def load_fresh_app(data_dir: str):
+    """
+    Import (or re-import) main with recording disabled and an empty data directory,
+    so every partition starts empty and has no calendar credentials
+    """
+    os.environ.pop(TRACE_FILE_ENV, None)
+    os.environ[DATA_DIR_ENV] = data_dir
+    if "main" in sys.modules:
+        module = importlib.reload(sys.modules["main"])
+    else:
+        module = importlib.import_module("main")
+    return module
+
+
+async def _call_app(app, entry: Dict[str, Any]) -> int:
+    """Drive a single recorded request through the ASGI app and return its status code"""
+    body = entry.get("b", "").encode("utf-8")
+    headers = [(b"host", b"replay")]
+    if entry.get("k"):
+        headers.append((b"cookie", entry["k"].encode("latin-1")))
+    if body:
+        headers.append((b"content-type", entry.get("c", "").encode("latin-1")))
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": entry["m"],
+        "scheme": "http",
+        "path": entry["p"],
+        "raw_path": entry["p"].encode("utf-8"),
+        "query_string": entry.get("q", "").encode("latin-1"),
+        "root_path": "",
+        "headers": headers,
+        "client": ("replay", 0),
+        "server": ("replay", 80)
+    }
+
+    messages = deque([{"type": "http.request", "body": body, "more_body": False}])
+    status = {"code": 0}
+
+    async def receive():
+        if messages:
+            return messages.popleft()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # Starlette has already sent its 500 response before re-raising
+        return status["code"] or 500
+    return status["code"]
+
+
+async def replay(app, entries: List[Dict[str, Any]], speed: float) -> Dict[str, Any]:
+    """
+    Replay entries sequentially, pacing them by recorded offsets divided by speed.
+    A speed of 0 replays as fast as possible.
+    """
+    latencies = defaultdict(list)
+    status_mismatches = 0
+    skipped = 0
+
+    started = time.perf_counter()
+    first_offset = entries[0]["t"] if entries else 0
+
+    for entry in entries:
+        if entry["p"].startswith(CREDENTIAL_PATH_PREFIXES):
+            skipped += 1
+            continue
+
+        if speed > 0:
+            due = (entry["t"] - first_offset) / speed
+            delay = due - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        token = _replay_ids.set(deque(entry.get("ids", [])))
+        start = time.perf_counter()
+        try:
+            status = await _call_app(app, entry)
+        finally:
+            _replay_ids.reset(token)
+        latencies[endpoint_name(entry["m"], entry["p"])].append((time.perf_counter() - start) * 1000)
+
+        if status != entry.get("s", status):
+            status_mismatches += 1
+
+    return {
+        "latencies": latencies,
+        "elapsed": time.perf_counter() - started,
+        "status_mismatches": status_mismatches,
+        "skipped": skipped
+    }
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def format_report(result: Dict[str, Any]) -> str:
+    """Format per-endpoint and overall latency distributions as a text table"""
+    rows = []
+    all_latencies = []
+    for endpoint, values in sorted(result["latencies"].items()):
+        all_latencies.extend(values)
+        rows.append((endpoint, sorted(values)))
+    rows.append(("ALL", sorted(all_latencies)))
+
+    lines = [f"{'endpoint':<40} {'count':>7} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)"]
+    for endpoint, values in rows:
+        if not values:
+            continue
+        lines.append(
+            f"{endpoint:<40} {len(values):>7} "
+            f"{_percentile(values, 50):>9.3f} {_percentile(values, 90):>9.3f} "
+            f"{_percentile(values, 99):>9.3f} {values[-1]:>9.3f}"
+        )
+
+    elapsed = result["elapsed"]
+    throughput = len(all_latencies) / elapsed if elapsed > 0 else 0
+    lines.append(f"\n{len(all_latencies)} requests in {elapsed:.3f}s ({throughput:.1f} req/s), "
+                 f"{result['skipped']} skipped, {result['status_mismatches']} status mismatches")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for replaying a trace file"""
+    parser = argparse.ArgumentParser(description="Replay a recorded Todo App request trace")
+    parser.add_argument("trace_file", help="Trace file recorded with TODO_TRACE_FILE")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="Replay speed multiplier, e.g. 1 or 10 (0 = as fast as possible)")
+    args = parser.parse_args(argv)
+
+    entries, snapshot = load_trace(args.trace_file)
+
+    # The replay's partitions are thrown away with the directory once the state is checked
+    with tempfile.TemporaryDirectory(prefix="todo-replay-") as data_dir:
+        app_module = load_fresh_app(data_dir)
+        result = asyncio.run(replay(app_module.app, entries, args.speed))
+        state = app_module.todo_state()
+    print(format_report(result))
+
+    exit_code = 0
+    if result["status_mismatches"]:
+        print(f"{result['status_mismatches']} replayed requests returned a different status than recorded")
+        exit_code = 1
+
+    if snapshot is None:
+        print("No state snapshot in trace - final state not verified")
+    elif state != snapshot:
+        print("Final todo state does NOT match the recorded snapshot")
+        exit_code = 1
+    else:
+        print("Final todo state matches the recorded snapshot")
+    return exit_code
+
+
+if __name__ == "__main__":
+    # Run from the importable module so main.py and the replayer share the same id context
+    import request_tracing
+    sys.exit(request_tracing.main())
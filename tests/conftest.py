@@ -0,0 +1,19 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """A freshly imported main module storing its partitions in a temporary directory"""
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setenv("TODO_DATA_DIR", str(tmp_path))
+    monkeypatch.delenv("TODO_TRACE_FILE", raising=False)
+    if "main" in sys.modules:
+        return importlib.reload(sys.modules["main"])
+    return importlib.import_module("main")
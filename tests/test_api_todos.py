@@ -0,0 +1,129 @@
+"""
+Endpoint tests for the faceted /api/todos view and the filtered main page.
+"""
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(app_module):
+    return TestClient(app_module.app)
+
+
+def add_todo(client, title, parent_id=None):
+    data = {"title": title}
+    if parent_id:
+        data["parent_id"] = parent_id
+    assert client.post("/add-todo", data=data, follow_redirects=False).status_code == 303
+
+
+def api_ids(client, **params):
+    response = client.get("/api/todos", params=params)
+    assert response.status_code == 200, response.text
+    return [todo["id"] for todo in response.json()["todos"]]
+
+
+def test_filters_follow_endpoint_mutations(client, app_module):
+    partition = app_module.partitions.get("default", "default")
+    for number in range(4):
+        add_todo(client, f"main {number}")
+    first, second = partition.todos_db[0], partition.todos_db[1]
+    for number in range(3):
+        add_todo(client, f"sub {number}", first.id)
+
+    assert api_ids(client, has_open_subtodos="1") == [first.id]
+    assert len(api_ids(client, level="1")) == 3
+
+    for subtodo in app_module.get_subtodos(partition, first.id):
+        client.post(f"/toggle-todo/{subtodo.id}")
+    # The parent auto-completed along with its last subtodo
+    assert api_ids(client, has_open_subtodos="1") == []
+    assert first.id in api_ids(client, status="completed", level="0")
+
+    client.post(f"/reopen-subtree/{first.id}")
+    assert api_ids(client, status="completed") == []
+
+    client.post(f"/move-down/{first.id}")
+    assert api_ids(client, level="0")[:2] == [second.id, first.id]
+
+    client.post(f"/move-subtree/{partition.todos_db[-1].id}", data={"new_parent_id": second.id})
+    assert api_ids(client, has_open_subtodos="1") == [second.id, first.id]
+
+    client.post(f"/delete-subtree/{first.id}")
+    assert first.id not in api_ids(client)
+    assert len(api_ids(client)) == len(partition.todos_db)
+
+
+def test_random_endpoint_traffic_matches_full_scan(client, app_module):
+    rng = random.Random(7)
+    partition = app_module.partitions.get("default", "default")
+
+    for step in range(150):
+        main_todos = [todo for todo in partition.todos_db if todo.parent_id is None]
+        action = rng.random()
+        if not partition.todos_db or action < 0.35:
+            parent = rng.choice(main_todos) if main_todos and rng.random() < 0.5 else None
+            add_todo(client, f"todo {step}", parent.id if parent else None)
+        else:
+            todo = rng.choice(partition.todos_db)
+            endpoint = rng.choice(["toggle-todo", "toggle-todo", "move-up", "move-down",
+                                   "delete-todo", "complete-subtree", "reopen-subtree"])
+            client.post(f"/{endpoint}/{todo.id}")
+
+        status = rng.choice([None, "open", "completed"])
+        params = {"status": status} if status else {}
+        # The unfiltered main page's hierarchical order, filtered by a full scan
+        expected = [todo for main_todo, subtodos in app_module.get_hierarchical_todos(partition)
+                    for todo in [main_todo] + subtodos]
+        if status:
+            expected = [todo for todo in expected if todo.completed == (status == "completed")]
+        assert api_ids(client, limit=1000, **params) == [todo.id for todo in expected]
+        assert api_ids(client, limit=2, **params) == [todo.id for todo in expected[:2]]
+
+
+def test_pagination(client, app_module):
+    for number in range(7):
+        add_todo(client, f"todo {number}")
+    partition = app_module.partitions.get("default", "default")
+    ids = [todo.id for todo in sorted(partition.todos_db, key=lambda todo: todo.sequence)]
+
+    first = client.get("/api/todos", params={"limit": 3, "status": "open"}).json()
+    assert [todo["id"] for todo in first["todos"]] == ids[:3] and first["has_more"]
+    last = client.get("/api/todos", params={"limit": 3, "offset": 6, "status": "open"}).json()
+    assert [todo["id"] for todo in last["todos"]] == ids[6:] and not last["has_more"]
+
+    page = client.get("/", params={"status": "open", "limit": 3, "offset": 3})
+    assert page.status_code == 200
+    assert "offset=6" in page.text and "offset=0" in page.text
+
+
+def test_completed_sort_lists_open_todos_last(client, app_module):
+    partition = app_module.partitions.get("default", "default")
+    for number in range(5):
+        add_todo(client, f"m{number}")
+    ids = {todo.title: todo.id for todo in partition.todos_db}
+    client.post(f"/delete-todo/{ids['m1']}")
+    add_todo(client, "m5")
+    ids = {todo.title: todo.id for todo in partition.todos_db}
+    client.post(f"/toggle-todo/{ids['m0']}")
+    client.post(f"/toggle-todo/{ids['m3']}")
+
+    titles = {todo_id: title for title, todo_id in ids.items()}
+    assert [titles[todo_id] for todo_id in api_ids(client, sort="-completed")] == ["m3", "m0", "m2", "m4", "m5"]
+    assert [titles[todo_id] for todo_id in api_ids(client, sort="completed")] == ["m0", "m3", "m2", "m4", "m5"]
+
+
+@pytest.mark.parametrize("params", [
+    {"sort": "title"},
+    {"status": "done"},
+    {"level": "x"},
+    {"created_from": "yesterday"},
+    {"has_open_subtodos": "maybe"},
+    {"limit": 0},
+    {"offset": -1},
+])
+def test_invalid_filters_are_rejected(client, params):
+    assert client.get("/api/todos", params=params).status_code == 400
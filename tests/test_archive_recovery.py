@@ -0,0 +1,167 @@
+"""
+Crash-recovery and paging tests for the archive (cold tier) and the partition store (hot tier).
+
+A crash is simulated by skipping the write that would have followed, then
+loading the partition again with a fresh PartitionManager.
+"""
+
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from partitions import PartitionManager
+from todo_archive import TodoArchive
+
+
+@pytest.fixture
+def client(app_module):
+    return TestClient(app_module.app)
+
+
+def reload_partition(app_module):
+    """Load the default list from disk as a restarted process would"""
+    manager = PartitionManager(app_module.partitions.data_dir, 4, app_module.Todo,
+                               app_module.RecurrenceTemplate, app_module.DEFAULT_USER_SETTINGS)
+    return manager.get("default", "default")
+
+
+def add_old_completed_todos(client, app_module, titles, completed):
+    """Add main todos and complete the given ones 100 days ago"""
+    partition = app_module.partitions.get("default", "default")
+    for title in titles:
+        client.post("/add-todo", data={"title": title})
+    for todo in partition.todos_db:
+        if todo.title in completed:
+            client.post(f"/toggle-todo/{todo.id}")
+            todo.completed_at = datetime.now() - timedelta(days=100)
+            partition.todo_index.update(todo)
+    return partition
+
+
+def test_stale_store_drops_archived_trees_on_reload(client, app_module, monkeypatch):
+    partition = add_old_completed_todos(client, app_module, ["a", "b", "c"], {"a", "b"})
+    app_module.partitions.save(partition)
+
+    # Crash after the archive write, before the store save
+    monkeypatch.setattr(app_module.partitions, "save", lambda partition: None)
+    assert app_module.archive_completed_todos(partition) == 2
+    monkeypatch.undo()
+
+    reloaded = reload_partition(app_module)
+    assert [(todo.title, todo.sequence) for todo in reloaded.todos_db] == [("c", 1)]
+    assert len(reloaded.todo_index) == 1
+    assert sorted(tree["root"]["title"] for _, tree in reloaded.todo_archive.iter_trees()) == ["a", "b"]
+
+
+def test_reloaded_sequences_have_no_gaps(client, app_module, monkeypatch):
+    partition = add_old_completed_todos(client, app_module, ["a", "b", "c", "d"], {"a", "c"})
+    app_module.partitions.save(partition)
+
+    monkeypatch.setattr(app_module.partitions, "save", lambda partition: None)
+    app_module.archive_completed_todos(partition)
+    monkeypatch.undo()
+
+    reloaded = reload_partition(app_module)
+    assert [(todo.title, todo.sequence) for todo in reloaded.todos_db] == [("b", 1), ("d", 2)]
+    assert [todo.title for todo in reloaded.todo_index.query()] == ["b", "d"]
+
+
+def test_pending_restore_is_completed_on_reload(client, app_module, monkeypatch):
+    partition = add_old_completed_todos(client, app_module, ["a", "b"], {"a"})
+    app_module.archive_completed_todos(partition)
+    segment, tree = next(partition.todo_archive.iter_trees())
+
+    # Crash after the store save, before the archive marks the tree restored
+    monkeypatch.setattr(partition.todo_archive, "mark_restored", lambda segment, entry: None)
+    client.post(f"/archive/restore/{segment}/{tree['entry']}")
+    monkeypatch.undo()
+
+    reloaded = reload_partition(app_module)
+    assert sorted(todo.title for todo in reloaded.todos_db) == ["a", "b"]
+    assert list(reloaded.todo_archive.iter_trees()) == []
+
+
+def test_restore_survives_restart(client, app_module):
+    partition = add_old_completed_todos(client, app_module, ["a", "b"], {"a"})
+    app_module.archive_completed_todos(partition)
+    segment, tree = next(partition.todo_archive.iter_trees())
+
+    response = client.post(f"/archive/restore/{segment}/{tree['entry']}", follow_redirects=False)
+    assert response.status_code == 303
+    assert client.post(f"/archive/restore/{segment}/{tree['entry']}").status_code == 404
+
+    reloaded = reload_partition(app_module)
+    assert [(todo.title, todo.sequence) for todo in reloaded.todos_db] == [("b", 1), ("a", 2)]
+    assert list(reloaded.todo_archive.iter_trees()) == []
+
+
+def tree(title, completed_at="2024-01-01T00:00:00"):
+    return {"completed_at": completed_at, "root": {"id": title, "title": title}, "subtodos": []}
+
+
+def test_interrupted_append_is_ignored_and_overwritten(tmp_path):
+    archive = TodoArchive(str(tmp_path), segment_max_trees=10)
+    archive.append_trees([tree("a"), tree("b")])
+
+    # An append that wrote its records but crashed before saving the manifest
+    segment = archive.manifest["segments"][0]
+    with gzip.open(tmp_path / segment["name"], 'at', encoding='utf-8') as f:
+        f.write(json.dumps(dict(tree("ghost"), entry=2)) + "\n")
+
+    reopened = TodoArchive(str(tmp_path), segment_max_trees=10)
+    assert [t["root"]["id"] for _, t in reopened.iter_trees()] == ["a", "b"]
+
+    reopened.append_trees([tree("c")])
+    listed = [(t["root"]["id"], t["entry"]) for _, t in TodoArchive(str(tmp_path)).iter_trees()]
+    assert listed == [("a", 0), ("b", 1), ("c", 2)]
+
+
+def test_appends_roll_over_segments_and_track_count(tmp_path):
+    archive = TodoArchive(str(tmp_path), segment_max_trees=2)
+    archive.append_trees([tree(f"t{number}") for number in range(5)])
+    assert [segment["count"] for segment in archive.manifest["segments"]] == [2, 2, 1]
+    assert archive.appended_count == 5
+    assert [t["root"]["id"] for t in archive.iter_appended_since(3)] == ["t3", "t4"]
+
+
+def test_cursor_continues_without_reopening_earlier_segments(tmp_path, monkeypatch):
+    archive = TodoArchive(str(tmp_path), segment_max_trees=2)
+    archive.append_trees([tree(f"t{number}") for number in range(5)])
+    archive.mark_restored("segment-00002.jsonl.gz", 1)
+
+    opened = []
+    original = archive._read_segment
+
+    def counting(segment):
+        opened.append(segment["name"])
+        return original(segment)
+
+    monkeypatch.setattr(archive, "_read_segment", counting)
+    listed = [t["root"]["id"] for _, t in archive.iter_trees(after=("segment-00002.jsonl.gz", 0))]
+    assert listed == ["t4"]
+    assert opened == ["segment-00002.jsonl.gz", "segment-00003.jsonl.gz"]
+    assert list(archive.iter_trees(after=("segment-00009.jsonl.gz", 0))) == []
+
+
+def test_archive_page_links_to_next_page(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "ARCHIVE_PAGE_SIZE", 2)
+    partition = add_old_completed_todos(client, app_module, ["first done", "second done", "third done"],
+                                        {"first done", "second done", "third done"})
+    app_module.archive_completed_todos(partition)
+    trees = list(partition.todo_archive.iter_trees())
+    segment, second = trees[1]
+
+    first_page = client.get("/archive", params={"start": "2000-01-01"})
+    assert first_page.status_code == 200
+    assert f"after={segment}%3A{second['entry']}" in first_page.text
+
+    last_page = client.get("/archive", params={"start": "2000-01-01", "after": f"{segment}:{second['entry']}"})
+    assert last_page.status_code == 200
+    assert trees[2][1]["root"]["title"] in last_page.text
+    assert trees[0][1]["root"]["title"] not in last_page.text
+    assert "after=" not in last_page.text and "First page" in last_page.text
+
+    assert client.get("/archive", params={"after": "segment-00001.jsonl.gz"}).status_code == 400
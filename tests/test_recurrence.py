@@ -0,0 +1,75 @@
+"""
+Endpoint tests for recurring todos and recurrence rule validation.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(app_module):
+    return TestClient(app_module.app)
+
+
+def add_recurring(client, rule):
+    return client.post("/add-todo", data={"title": "habit", "recurrence": rule}, follow_redirects=False)
+
+
+def test_preset_rollover_keeps_one_row(client, app_module):
+    partition = app_module.partitions.get("default", "default")
+    assert add_recurring(client, "daily").status_code == 303
+    occurrence = partition.todos_db[0]
+    template = partition.recurrence_templates[occurrence.recurrence_id]
+    first_due, first_id = occurrence.due_at, occurrence.id
+
+    for _ in range(3):
+        client.post(f"/toggle-todo/{partition.todos_db[0].id}")
+
+    assert len(partition.todos_db) == 1
+    occurrence = partition.todos_db[0]
+    assert not occurrence.completed and occurrence.id != first_id
+    assert occurrence.due_at > first_due
+    assert template.completed_count == 3
+    assert client.get("/api/todos", params={"status": "open"}).json()["todos"][0]["id"] == occurrence.id
+
+
+def test_count_exhaustion_leaves_completed_occurrence(client, app_module):
+    partition = app_module.partitions.get("default", "default")
+    assert add_recurring(client, "FREQ=DAILY;COUNT=2").status_code == 303
+
+    client.post(f"/toggle-todo/{partition.todos_db[0].id}")
+    assert not partition.todos_db[0].completed
+
+    client.post(f"/toggle-todo/{partition.todos_db[0].id}")
+    occurrence = partition.todos_db[0]
+    assert len(partition.todos_db) == 1
+    assert occurrence.completed and occurrence.recurrence_id is None
+    assert partition.recurrence_templates == {}
+
+
+@pytest.mark.parametrize("rule", [
+    "weekly",
+    "RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE",
+    "FREQ=MONTHLY;BYDAY=-1FR",
+    "FREQ=MONTHLY;BYMONTHDAY=15",
+    "FREQ=DAILY;INTERVAL=01;BYDAY=MO",
+])
+def test_accepted_rules(client, rule):
+    assert add_recurring(client, rule).status_code == 303
+
+
+@pytest.mark.parametrize("rule", [
+    "FREQ=SECONDLY;BYMONTH=2;BYMONTHDAY=30",
+    "FREQ=HOURLY",
+    "FREQ=DAILY;BYMONTH=2;BYMONTHDAY=30",
+    "FREQ=MONTHLY;BYDAY=6MO",
+    "FREQ=MONTHLY;BYDAY=4FR;BYMONTHDAY=1",
+    "FREQ=WEEKLY;BYMONTHDAY=3",
+    "FREQ=DAILY;INTERVAL=7;BYDAY=TU",
+    "FREQ=DAILY;INTERVAL=0",
+    "FREQ=DAILY;UNTIL=20000101",
+    "not a rule",
+])
+def test_rejected_rules(client, app_module, rule):
+    assert add_recurring(client, rule).status_code == 400
+    assert app_module.partitions.get("default", "default").todos_db == []
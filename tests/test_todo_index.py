@@ -0,0 +1,306 @@
+"""
+Randomized consistency tests for TodoIndex.
+
+A random sequence of the mutations main.py performs (add, toggle, remove,
+move, reorder) is applied to a plain list of todos while the index is kept
+up to date the same way the endpoints do. After every step, index queries
+must match a brute-force scan of the list.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytest
+
+from todo_index import TodoIndex
+
+
+class FakeTodo:
+    def __init__(self, todo_id: str, sequence: int, created_at: datetime,
+                 parent_id: Optional[str] = None, level: int = 0):
+        self.id = todo_id
+        self.title = todo_id
+        self.sequence = sequence
+        self.created_at = created_at
+        self.parent_id = parent_id
+        self.level = level
+        self.completed = False
+        self.completed_at = None
+
+
+class Store:
+    """The todo list plus its index, mutated the way main.py mutates a partition"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.todos = []
+        self.index = TodoIndex()
+        self.clock = datetime(2024, 1, 1)
+        self.next_id = 0
+
+    def tick(self) -> datetime:
+        # Unique timestamps keep timestamp sorts unambiguous
+        self.clock += timedelta(minutes=self.rng.randint(1, 600))
+        return self.clock
+
+    def siblings(self, parent_id):
+        return [todo for todo in self.todos if todo.parent_id == parent_id]
+
+    def renumber(self, parent_id):
+        for sequence, todo in enumerate(sorted(self.siblings(parent_id), key=lambda t: t.sequence), 1):
+            todo.sequence = sequence
+
+    def subtree(self, root):
+        subtree = [root]
+        for todo in subtree:
+            subtree.extend(child for child in self.todos if child.parent_id == todo.id)
+        return subtree
+
+    def add(self):
+        parents = [todo for todo in self.todos if todo.level == 0]
+        parent = self.rng.choice(parents) if parents and self.rng.random() < 0.6 else None
+        parent_id = parent.id if parent else None
+        todo = FakeTodo(f"t{self.next_id}", len(self.siblings(parent_id)) + 1, self.tick(),
+                        parent_id, 1 if parent else 0)
+        self.next_id += 1
+        self.todos.append(todo)
+        self.index.add(todo)
+        if parent:
+            self.update_parent(parent)
+
+    def update_parent(self, parent):
+        """check_and_update_parent_completion"""
+        children = self.siblings(parent.id)
+        if not children:
+            return
+        if all(child.completed for child in children) and not parent.completed:
+            parent.completed, parent.completed_at = True, self.tick()
+        elif not all(child.completed for child in children) and parent.completed:
+            parent.completed, parent.completed_at = False, None
+        self.index.update(parent)
+
+    def toggle(self):
+        todo = self.rng.choice(self.todos)
+        todo.completed = not todo.completed
+        todo.completed_at = self.tick() if todo.completed else None
+        self.index.update(todo)
+        if todo.parent_id:
+            self.update_parent(self.index.get(todo.parent_id))
+
+    def remove(self):
+        root = self.rng.choice(self.todos)
+        doomed = self.subtree(root)
+        for todo in doomed:
+            self.index.remove(todo)
+        doomed_ids = {todo.id for todo in doomed}
+        self.todos = [todo for todo in self.todos if todo.id not in doomed_ids]
+        self.renumber(root.parent_id)
+        if root.parent_id:
+            self.update_parent(self.index.get(root.parent_id))
+
+    def move(self):
+        """move_subtree - childless todos can move anywhere, main todos with children stay main"""
+        todo = self.rng.choice(self.todos)
+        if self.siblings(todo.id):
+            return
+        targets = [parent for parent in self.todos if parent.level == 0 and parent.id != todo.id]
+        new_parent = self.rng.choice(targets) if targets and self.rng.random() < 0.7 else None
+        new_parent_id = new_parent.id if new_parent else None
+        old_parent_id = todo.parent_id
+        if new_parent_id == old_parent_id:
+            return
+        todo.sequence = len(self.siblings(new_parent_id)) + 1
+        todo.parent_id = new_parent_id
+        todo.level = 1 if new_parent else 0
+        self.index.update(todo)
+        self.renumber(old_parent_id)
+        if old_parent_id:
+            self.update_parent(self.index.get(old_parent_id))
+        if new_parent:
+            self.update_parent(new_parent)
+
+    def swap(self):
+        """move-up / move-down"""
+        todo = self.rng.choice(self.todos)
+        neighbour = next((sibling for sibling in self.siblings(todo.parent_id)
+                          if sibling.sequence == todo.sequence - 1), None)
+        if neighbour:
+            neighbour.sequence, todo.sequence = todo.sequence, neighbour.sequence
+            self.index.reposition(todo)
+
+    def mutate(self):
+        if not self.todos:
+            self.add()
+            return
+        operation = self.rng.choices(
+            [self.add, self.toggle, self.remove, self.move, self.swap],
+            weights=[5, 4, 1, 1, 2]
+        )[0]
+        operation()
+
+
+def sequence_path(store: Store, todo) -> tuple:
+    path = [todo.sequence]
+    while todo.parent_id:
+        todo = store.index.get(todo.parent_id)
+        path.append(todo.sequence)
+    return tuple(reversed(path))
+
+
+def brute_force(store: Store, completed=None, level=None, has_open_subtodos=None,
+                created_from=None, created_to=None, completed_from=None, completed_to=None,
+                sort="sequence", limit=None):
+    def matches(todo):
+        if completed is not None and todo.completed != completed:
+            return False
+        if level is not None and todo.level != level:
+            return False
+        if has_open_subtodos is not None:
+            has_open = any(not child.completed for child in store.siblings(todo.id))
+            if has_open != has_open_subtodos:
+                return False
+        for start, end, value in ((created_from, created_to, todo.created_at),
+                                  (completed_from, completed_to, todo.completed_at)):
+            if start is None and end is None:
+                continue
+            if value is None or (start and value < start) or (end and value > end):
+                return False
+        return True
+
+    found = [todo for todo in store.todos if matches(todo)]
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    if field == "sequence":
+        key = lambda todo: sequence_path(store, todo)
+    elif field == "created":
+        key = lambda todo: todo.created_at
+    else:
+        # Never-completed todos come last in either direction, in sequence order
+        never_completed = sorted((todo for todo in found if todo.completed_at is None),
+                                 key=lambda todo: sequence_path(store, todo))
+        found = [todo for todo in found if todo.completed_at is not None]
+        found.sort(key=lambda todo: todo.completed_at, reverse=descending)
+        return [todo.id for todo in (found + never_completed)[:limit]]
+    found.sort(key=key, reverse=descending)
+    return [todo.id for todo in found[:limit]]
+
+
+def random_query(store: Store) -> dict:
+    rng = store.rng
+    query = {}
+    if rng.random() < 0.5:
+        query["completed"] = rng.choice([True, False])
+    if rng.random() < 0.3:
+        query["level"] = rng.choice([0, 1])
+    if rng.random() < 0.3:
+        query["has_open_subtodos"] = rng.choice([True, False])
+    if rng.random() < 0.3:
+        start = datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 60000))
+        query["created_from"] = start
+        query["created_to"] = start + timedelta(minutes=rng.randint(0, 60000))
+    query["sort"] = rng.choice(["sequence", "-sequence", "created", "-created", "completed", "-completed"])
+    if rng.random() < 0.3:
+        start = datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 60000))
+        query["completed_from"] = start
+        query["completed_to"] = start + timedelta(minutes=rng.randint(0, 60000))
+    query["limit"] = rng.choice([None, 1, 3, 10])
+    return query
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_index_matches_full_scan(seed):
+    rng = random.Random(seed)
+    store = Store(rng)
+
+    for _ in range(300):
+        store.mutate()
+        assert len(store.index) == len(store.todos)
+        for _ in range(3):
+            query = random_query(store)
+            expected = brute_force(store, **query)
+            assert [todo.id for todo in store.index.query(**query)] == expected, query
+
+    # A freshly bulk-built index agrees with the incrementally maintained one
+    rebuilt = TodoIndex(store.todos)
+    for _ in range(50):
+        query = random_query(store)
+        assert [todo.id for todo in rebuilt.query(**query)] == brute_force(store, **query), query
+
+
+def test_children_follow_moves_and_removals():
+    rng = random.Random(42)
+    store = Store(rng)
+    for _ in range(500):
+        store.mutate()
+        for todo in store.todos:
+            expected = sorted(store.siblings(todo.id), key=lambda t: t.sequence)
+            assert [child.id for child in store.index.children(todo.id)] == [child.id for child in expected]
+
+
+def test_sequence_pages_stop_early():
+    todos = []
+    for number in range(1, 20001):
+        todo = FakeTodo(f"t{number}", number, datetime(2024, 1, 1) + timedelta(minutes=number))
+        todo.completed = number % 2 == 0
+        todo.completed_at = todo.created_at if todo.completed else None
+        todos.append(todo)
+    index = TodoIndex(todos)
+
+    visited = []
+    original = index._subtree_slots
+
+    def counting(slot, depth=None):
+        visited.append(slot)
+        return original(slot, depth)
+
+    index._subtree_slots = counting
+    page = index.query(completed=False, limit=10)
+    assert [todo.sequence for todo in page] == list(range(1, 21, 2))
+    assert len(visited) < 100
+
+
+def test_recent_date_range_stops_walking_the_hierarchy():
+    # Created dates grow with sequence numbers, so a recent range matches only the last todos
+    todos = [FakeTodo(f"t{number}", number, datetime(2024, 1, 1) + timedelta(minutes=number))
+             for number in range(1, 20001)]
+    index = TodoIndex(todos)
+
+    visited = []
+    original_subtree, original_path = index._subtree_slots, index._sequence_path
+
+    def counting_subtree(slot, depth=None):
+        visited.append(slot)
+        return original_subtree(slot, depth)
+
+    def counting_path(todo):
+        visited.append(todo)
+        return original_path(todo)
+
+    index._subtree_slots = counting_subtree
+    index._sequence_path = counting_path
+    page = index.query(created_from=datetime(2024, 1, 1) + timedelta(minutes=18001), limit=10)
+    assert [todo.sequence for todo in page] == list(range(18001, 18011))
+    # The walk gives up after as many todos as the range holds, then the range is sorted
+    assert len(visited) <= 3 * 2000
+
+
+def test_completed_sort_lists_never_completed_todos_last():
+    todos = [FakeTodo(f"m{number}", number + 1, datetime(2024, 1, 1) + timedelta(minutes=number))
+             for number in range(5)]
+    index = TodoIndex(todos)
+    removed = todos.pop(1)
+    index.remove(removed)
+    for sequence, todo in enumerate(todos, 1):
+        todo.sequence = sequence
+        index.reposition(todo)
+    todo = FakeTodo("m5", 5, datetime(2024, 1, 2))
+    todos.append(todo)
+    index.add(todo)
+    for number, todo in ((0, todos[0]), (3, todos[2])):
+        todo.completed, todo.completed_at = True, datetime(2024, 2, 1) + timedelta(minutes=number)
+        index.update(todo)
+
+    assert [todo.id for todo in index.query(sort="-completed")] == ["m3", "m0", "m2", "m4", "m5"]
+    assert [todo.id for todo in index.query(sort="completed")] == ["m0", "m3", "m2", "m4", "m5"]
+    assert [todo.id for todo in index.query(sort="-completed", limit=3)] == ["m3", "m0", "m2"]
@@ -0,0 +1,206 @@
+"""
+Todo Archive Module
+
+This module implements the cold tier for completed todos. Completed
+top-level trees are moved out of the in-memory store into compressed,
+append-only segments on disk. It provides functionality to:
+- Append archived trees to gzip JSON-lines segments
+- Track per-segment completion date ranges in a small manifest
+- Lazily stream archived trees for a date range, opening only matching segments
+- Continue a listing after a given tree, skipping the segments before it
+- Take a tree back out of the archive when it is restored
+- Recover from a crash between an archive write and the hot store save
+
+The manifest is the commit point: segment bytes beyond the size it records
+were written by an interrupted append and are ignored, then overwritten.
+"""
+
+import os
+import gzip
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Optional, Dict, Any, List, Iterator, Tuple
+
+
+class TodoArchive:
+    def __init__(self, directory: str, segment_max_trees: int = 1000):
+        """Initialize the archive rooted at a directory (created on first write)"""
+        self.directory = directory
+        self.manifest_file = os.path.join(directory, "manifest.json")
+        self.segment_max_trees = segment_max_trees
+        self._manifest = None
+
+    @property
+    def manifest(self) -> Dict[str, Any]:
+        """Segment metadata and restored tree keys, loaded on first use"""
+        if self._manifest is None:
+            if os.path.exists(self.manifest_file):
+                with open(self.manifest_file, 'r') as f:
+                    self._manifest = json.load(f)
+            else:
+                self._manifest = {"segments": [], "restored": []}
+        return self._manifest
+
+    def _save_manifest(self):
+        """Atomically replace the manifest file"""
+        temp_file = self.manifest_file + ".tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(temp_file, self.manifest_file)
+
+    def _segment_path(self, name: str) -> str:
+        """Full path of a segment file"""
+        return os.path.join(self.directory, name)
+
+    def _restored_key(self, segment_name: str, entry: int) -> str:
+        """Restored trees are tracked per archived copy so a re-archived tree stays visible"""
+        return f"{segment_name}:{entry}"
+
+    def _read_segment(self, segment: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Yield the committed records of a segment in entry order"""
+        with gzip.open(self._segment_path(segment["name"]), 'rt', encoding='utf-8') as f:
+            for line in islice(f, segment["count"]):
+                yield json.loads(line)
+
+    @property
+    def appended_count(self) -> int:
+        """Number of trees ever appended, including restored ones"""
+        return sum(segment["count"] for segment in self.manifest["segments"])
+
+    def iter_appended_since(self, appended_count: int) -> Iterator[Dict[str, Any]]:
+        """Yield trees appended after the archive held appended_count trees"""
+        skip = appended_count
+        for segment in self.manifest["segments"]:
+            if skip >= segment["count"]:
+                skip -= segment["count"]
+                continue
+            yield from islice(self._read_segment(segment), skip, None)
+            skip = 0
+
+    def append_trees(self, trees: List[Dict[str, Any]]):
+        """
+        Append archived trees to the current segment, rolling over to a new one when full
+
+        Args:
+            trees: List of {"completed_at": iso timestamp, "root": todo dict, "subtodos": [todo dicts]}
+        """
+        if not trees:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.manifest["segments"]
+
+        remaining = list(trees)
+        while remaining:
+            if not segments or segments[-1]["count"] >= self.segment_max_trees:
+                segments.append({
+                    "name": f"segment-{len(segments) + 1:05d}.jsonl.gz",
+                    "count": 0,
+                    "first_completed": None,
+                    "last_completed": None,
+                    "size": 0
+                })
+            segment = segments[-1]
+
+            room = self.segment_max_trees - segment["count"]
+            batch, remaining = remaining[:room], remaining[room:]
+
+            # Drop bytes left by an append that crashed before the manifest was saved
+            path = self._segment_path(segment["name"])
+            if "size" in segment and os.path.exists(path) and os.path.getsize(path) > segment["size"]:
+                with open(path, 'r+b') as f:
+                    f.truncate(segment["size"])
+
+            # Each append adds a new gzip member - readers see one continuous stream
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                for entry, tree in enumerate(batch, segment["count"]):
+                    record = dict(tree, entry=entry)
+                    f.write(json.dumps(record, separators=(',', ':')) + "\n")
+            segment["size"] = os.path.getsize(path)
+
+            completed = [tree["completed_at"] for tree in batch]
+            if segment["first_completed"] is not None:
+                completed.append(segment["first_completed"])
+                completed.append(segment["last_completed"])
+            segment["first_completed"] = min(completed)
+            segment["last_completed"] = max(completed)
+            segment["count"] += len(batch)
+
+        self._save_manifest()
+
+    def iter_trees(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   after: Optional[Tuple[str, int]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Lazily yield (segment name, tree) for archived trees completed within [start, end].
+        Each yielded tree carries its "entry" number within the segment.
+        Segments whose date range does not overlap are never opened.
+
+        Args:
+            start: Earliest completion time, or None
+            end: Latest completion time, or None
+            after: (segment name, entry) of the last tree already listed - the listing
+                continues with the tree after it, without opening earlier segments
+        """
+        start_iso = start.isoformat() if start else None
+        end_iso = end.isoformat() if end else None
+        restored = set(self.manifest["restored"])
+
+        segments = self.manifest["segments"]
+        after_entry = -1
+        if after is not None:
+            names = [segment["name"] for segment in segments]
+            if after[0] not in names:
+                return
+            segments = segments[names.index(after[0]):]
+            after_entry = after[1]
+
+        for segment in segments:
+            if segment["count"] == 0:
+                continue
+            if start_iso and segment["last_completed"] < start_iso:
+                continue
+            if end_iso and segment["first_completed"] > end_iso:
+                continue
+
+            records = self._read_segment(segment)
+            if after is not None and segment["name"] == after[0]:
+                records = islice(records, after_entry + 1, None)
+            for tree in records:
+                if self._restored_key(segment["name"], tree["entry"]) in restored:
+                    continue
+                if start_iso and tree["completed_at"] < start_iso:
+                    continue
+                if end_iso and tree["completed_at"] > end_iso:
+                    continue
+                yield segment["name"], tree
+
+    def read_tree(self, segment_name: str, entry: int) -> Optional[Dict[str, Any]]:
+        """
+        Read an archived tree by its entry number. It stays listed until mark_restored is called,
+        which callers do only once the tree is safely back in the hot store.
+
+        Returns:
+            The archived tree, or None if it does not exist or was already restored
+        """
+        if self._restored_key(segment_name, entry) in self.manifest["restored"]:
+            return None
+        for segment in self.manifest["segments"]:
+            if segment["name"] == segment_name:
+                return next((tree for tree in self._read_segment(segment) if tree["entry"] == entry), None)
+        return None
+
+    def mark_restored(self, segment_name: str, entry: int):
+        """Stop listing a restored tree (safe to repeat)"""
+        restored_key = self._restored_key(segment_name, entry)
+        if restored_key not in self.manifest["restored"]:
+            self.manifest["restored"].append(restored_key)
+            self._save_manifest()
+
+    def stats(self) -> Dict[str, int]:
+        """Count archived segments and trees still in the archive"""
+        segments = self.manifest["segments"]
+        return {
+            "segments": len(segments),
+            "trees": sum(segment["count"] for segment in segments) - len(self.manifest["restored"])
+        }
@@ -0,0 +1,444 @@
+"""
+Todo Index Module
+
+This module maintains secondary indexes over a partition's todos so
+filtered views never need a full scan. It provides functionality to:
+- Track status, level and "has open subtodos" as bitmaps (Python ints)
+- Map each todo to its direct subtodos for subtree walks
+- Keep main todos in sequence order so hierarchical pages stop early
+- Keep created_at / completed_at in sorted lists for range queries
+- Update every index incrementally when a todo is added, changed or removed
+- Answer faceted queries with optional sorting by sequence or timestamp
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from heapq import nlargest, nsmallest
+from itertools import chain
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Tuple
+
+
+# Sort options accepted by query(); a leading "-" means descending
+SORT_FIELDS = ("sequence", "created", "completed")
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """Yield the positions of set bits in ascending order"""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for byte_index, byte in enumerate(data):
+        if not byte:
+            continue
+        for bit in range(8):
+            if byte >> bit & 1:
+                yield byte_index * 8 + bit
+
+
+class TodoIndex:
+    def __init__(self, todos: Iterable = ()):
+        """Build the indexes for an existing collection of todos"""
+        self._todos = []        # slot -> todo (None for free slots)
+        self._slots = {}        # todo id -> slot
+        self._indexed = {}      # slot -> indexed values as of the last add/update
+        self._free_slots = []
+
+        self._all = 0
+        self._completed = 0
+        self._levels = {}       # level -> bitmap
+        self._has_open_subtodos = 0
+        self._open_children = {}  # parent id -> number of open subtodos
+        self._children = {}     # parent id -> set of subtodo slots
+        self._root_order = []   # main todo slots in sequence order
+
+        self._sorted = {"created": [], "completed": []}  # field -> sorted [(timestamp, slot)]
+
+        self._bulk_load(todos)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def get(self, todo_id: str):
+        """Find an indexed todo by id"""
+        slot = self._slots.get(todo_id)
+        return self._todos[slot] if slot is not None else None
+
+    def children(self, todo_id: str) -> List:
+        """Direct subtodos of a todo in sequence order"""
+        slots = self._children.get(todo_id, ())
+        return sorted((self._todos[slot] for slot in slots), key=lambda todo: todo.sequence)
+
+    def _slot_sequence(self, slot: int) -> int:
+        return self._todos[slot].sequence
+
+    def _insert_root(self, slot: int):
+        """Place a main todo in the sequence order"""
+        position = bisect_right(self._root_order, self._slot_sequence(slot), key=self._slot_sequence)
+        self._root_order.insert(position, slot)
+
+    def _remove_root(self, slot: int):
+        """Take a main todo out of the sequence order"""
+        position = bisect_left(self._root_order, self._slot_sequence(slot), key=self._slot_sequence)
+        if position < len(self._root_order) and self._root_order[position] == slot:
+            del self._root_order[position]
+        else:
+            # Its sequence changed since it was placed (e.g. moved under a parent)
+            self._root_order.remove(slot)
+
+    def reposition(self, todo):
+        """
+        Restore the sequence order after a main todo swapped sequence numbers with a neighbour.
+        Renumbering that keeps the relative order (closing gaps) needs no call.
+        """
+        slot = self._slots.get(todo.id)
+        if slot is None or todo.parent_id:
+            return
+        self._root_order.remove(slot)
+        self._insert_root(slot)
+
+    def _values(self, todo) -> Dict[str, Any]:
+        """Indexed fields of a todo"""
+        return {
+            "completed": todo.completed,
+            "level": todo.level,
+            "parent_id": todo.parent_id,
+            "created": todo.created_at,
+            "completed_at": todo.completed_at
+        }
+
+    def _bulk_load(self, todos: Iterable):
+        """
+        Build every index in one pass. Setting bits one at a time would copy the
+        whole bitmap per todo, so bitmaps are assembled as byte arrays instead.
+        """
+        self._todos = list(todos)
+        size = (len(self._todos) + 7) // 8
+        all_bytes = bytearray(size)
+        completed_bytes = bytearray(size)
+        level_bytes = {}
+        open_children = self._open_children
+        children = self._children
+
+        for slot, todo in enumerate(self._todos):
+            values = self._values(todo)
+            self._slots[todo.id] = slot
+            self._indexed[slot] = values
+
+            byte, bit = slot >> 3, 1 << (slot & 7)
+            all_bytes[byte] |= bit
+            if values["completed"]:
+                completed_bytes[byte] |= bit
+            level_bytes.setdefault(values["level"], bytearray(size))[byte] |= bit
+            if values["parent_id"]:
+                children.setdefault(values["parent_id"], set()).add(slot)
+                if not values["completed"]:
+                    open_children[values["parent_id"]] = open_children.get(values["parent_id"], 0) + 1
+            else:
+                self._root_order.append(slot)
+
+            self._sorted["created"].append((values["created"], slot))
+            if values["completed_at"] is not None:
+                self._sorted["completed"].append((values["completed_at"], slot))
+
+        open_bytes = bytearray(size)
+        for parent_id in open_children:
+            slot = self._slots.get(parent_id)
+            if slot is not None:
+                open_bytes[slot >> 3] |= 1 << (slot & 7)
+
+        self._all = int.from_bytes(all_bytes, 'little')
+        self._completed = int.from_bytes(completed_bytes, 'little')
+        self._levels = {level: int.from_bytes(data, 'little') for level, data in level_bytes.items()}
+        self._has_open_subtodos = int.from_bytes(open_bytes, 'little')
+        for entries in self._sorted.values():
+            entries.sort()
+        self._root_order.sort(key=self._slot_sequence)
+
+    def _set_open_children(self, parent_id: str, delta: int):
+        """Adjust a parent's open subtodo count and its has-open-subtodos bit"""
+        count = self._open_children.get(parent_id, 0) + delta
+        if count:
+            self._open_children[parent_id] = count
+        else:
+            self._open_children.pop(parent_id, None)
+
+        parent_slot = self._slots.get(parent_id)
+        if parent_slot is not None:
+            if count:
+                self._has_open_subtodos |= 1 << parent_slot
+            else:
+                self._has_open_subtodos &= ~(1 << parent_slot)
+
+    def _insert(self, slot: int, values: Dict[str, Any]):
+        """Add a slot's values to every index"""
+        bit = 1 << slot
+        self._all |= bit
+        if values["completed"]:
+            self._completed |= bit
+        self._levels[values["level"]] = self._levels.get(values["level"], 0) | bit
+        if values["parent_id"]:
+            self._children.setdefault(values["parent_id"], set()).add(slot)
+            if not values["completed"]:
+                self._set_open_children(values["parent_id"], 1)
+        else:
+            self._insert_root(slot)
+
+        insort(self._sorted["created"], (values["created"], slot))
+        if values["completed_at"] is not None:
+            insort(self._sorted["completed"], (values["completed_at"], slot))
+
+    def _delete(self, slot: int, values: Dict[str, Any]):
+        """Remove a slot's values from every index"""
+        mask = ~(1 << slot)
+        self._all &= mask
+        self._completed &= mask
+        self._levels[values["level"]] &= mask
+        if values["parent_id"]:
+            siblings = self._children[values["parent_id"]]
+            siblings.discard(slot)
+            if not siblings:
+                del self._children[values["parent_id"]]
+            if not values["completed"]:
+                self._set_open_children(values["parent_id"], -1)
+        else:
+            self._remove_root(slot)
+
+        self._remove_sorted("created", values["created"], slot)
+        if values["completed_at"] is not None:
+            self._remove_sorted("completed", values["completed_at"], slot)
+
+    def _remove_sorted(self, field: str, timestamp: datetime, slot: int):
+        """Remove one (timestamp, slot) entry from a sorted index"""
+        entries = self._sorted[field]
+        position = bisect_left(entries, (timestamp, slot))
+        if position < len(entries) and entries[position] == (timestamp, slot):
+            del entries[position]
+
+    def add(self, todo):
+        """Index a new todo"""
+        if todo.id in self._slots:
+            self.update(todo)
+            return
+
+        slot = self._free_slots.pop() if self._free_slots else len(self._todos)
+        if slot == len(self._todos):
+            self._todos.append(todo)
+        else:
+            self._todos[slot] = todo
+        self._slots[todo.id] = slot
+
+        values = self._values(todo)
+        self._indexed[slot] = values
+        self._insert(slot, values)
+
+        # Subtodos indexed before their parent still count towards it
+        if self._open_children.get(todo.id):
+            self._has_open_subtodos |= 1 << slot
+
+    def update(self, todo):
+        """Re-index a todo after its fields changed"""
+        slot = self._slots.get(todo.id)
+        if slot is None:
+            self.add(todo)
+            return
+
+        values = self._values(todo)
+        if values == self._indexed[slot]:
+            return
+        self._delete(slot, self._indexed[slot])
+        self._indexed[slot] = values
+        self._insert(slot, values)
+
+    def remove(self, todo):
+        """Drop a todo from every index, using the values it was indexed with"""
+        slot = self._slots.pop(todo.id, None)
+        if slot is None:
+            return
+
+        self._delete(slot, self._indexed.pop(slot))
+        self._has_open_subtodos &= ~(1 << slot)
+        self._todos[slot] = None
+        self._free_slots.append(slot)
+
+    def _sequence_path(self, todo) -> Tuple[int, ...]:
+        """Sequence numbers from the main todo down, giving hierarchical order"""
+        path = [todo.sequence]
+        parent = self.get(todo.parent_id) if todo.parent_id else None
+        while parent is not None:
+            path.append(parent.sequence)
+            parent = self.get(parent.parent_id) if parent.parent_id else None
+        return tuple(reversed(path))
+
+    def _subtree_slots(self, slot: int, depth: Optional[int] = None) -> List[int]:
+        """A todo's slot followed by its descendants' slots (down to depth levels) in sequence order"""
+        slots = [slot]
+        if depth == 0:
+            return slots
+        for child in sorted(self._children.get(self._todos[slot].id, ()), key=self._slot_sequence):
+            slots.extend(self._subtree_slots(child, None if depth is None else depth - 1))
+        return slots
+
+    def _iter_sequence_order(self, descending: bool = False, max_level: Optional[int] = None) -> Iterator[int]:
+        """Yield slots in hierarchical order, one main todo's subtree at a time, skipping deeper levels"""
+        roots = reversed(self._root_order) if descending else self._root_order
+        for root in roots:
+            subtree = self._subtree_slots(root, max_level)
+            yield from reversed(subtree) if descending else subtree
+
+    def query(self,
+              completed: Optional[bool] = None,
+              level: Optional[int] = None,
+              has_open_subtodos: Optional[bool] = None,
+              created_from: Optional[datetime] = None,
+              created_to: Optional[datetime] = None,
+              completed_from: Optional[datetime] = None,
+              completed_to: Optional[datetime] = None,
+              sort: str = "sequence",
+              limit: Optional[int] = None) -> List:
+        """
+        Find todos matching every given facet, sorted by sequence (hierarchical order),
+        created or completed time. Prefix the sort with "-" for descending order.
+        With a limit, queries walk an index already in the requested order and stop as soon
+        as enough todos matched, unless the matches are so sparse that sorting them is cheaper.
+        A completed sort lists todos that were never completed last, in sequence order.
+        """
+        descending = sort.startswith("-")
+        sort_field = sort.lstrip("-")
+        if sort_field not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort: {sort}")
+
+        # Intersect the bitmap facets
+        bits = self._all
+        if completed is True:
+            bits &= self._completed
+        elif completed is False:
+            bits &= ~self._completed
+        if level is not None:
+            bits &= self._levels.get(level, 0)
+        if has_open_subtodos is True:
+            bits &= self._has_open_subtodos
+        elif has_open_subtodos is False:
+            bits &= ~self._has_open_subtodos
+        if not bits:
+            return []
+
+        membership = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+        def is_member(slot: int) -> bool:
+            return slot >> 3 < len(membership) and membership[slot >> 3] >> (slot & 7) & 1
+
+        ranges = {
+            "created": (created_from, created_to),
+            "completed": (completed_from, completed_to)
+        }
+
+        active_ranges = {field: bounds for field, bounds in ranges.items() if bounds != (None, None)}
+
+        # A timestamp sort walks its sorted index; otherwise a date range narrows the candidates
+        driver = sort_field if sort_field in ranges else next(iter(active_ranges), None)
+        if driver is not None:
+            start, end = ranges[driver]
+            entries = self._sorted[driver]
+            low = bisect_left(entries, (start,)) if start else 0
+            high = bisect_right(entries, (end, float("inf"))) if end else len(entries)
+            candidates = high - low
+        else:
+            candidates = bits.bit_count()
+
+        # In sequence order, walking the hierarchy until the page is full visits about
+        # limit * len / candidates todos if the matches are spread evenly, while sorting
+        # the candidates visits all of them
+        if sort_field == "sequence" and limit is not None and limit * len(self) < candidates * candidates:
+            # Matches can still cluster at one end (dates grow with sequence numbers), so
+            # give up once the walk has visited as many todos as sorting would
+            matches = self._collect(self._iter_sequence_order(descending, max_level=level), is_member,
+                                    list(active_ranges.items()), limit, budget=candidates)
+            if matches is not None:
+                return matches
+
+        if driver is not None:
+            positions = range(low, high)
+            if descending and driver == sort_field:
+                positions = reversed(positions)
+            slots = (entries[position][1] for position in positions)
+
+            # Todos that were never completed are missing from the completed index -
+            # they follow the completed ones in either direction, in sequence order
+            if driver == "completed" and "completed" not in active_ranges:
+                never_completed = self._iter_by_sequence(bits & ~self._completed, level)
+                slots = chain(slots, never_completed) if bits & self._completed else never_completed
+        else:
+            slots = iter_bits(bits)
+
+        other_ranges = [(field, bounds) for field, bounds in active_ranges.items() if field != driver]
+
+        # Walking the index of the sort field yields todos already in order
+        in_order = driver == sort_field
+        matches = self._collect(slots, is_member, other_ranges, limit if in_order else None)
+
+        if in_order:
+            return matches[:limit] if limit is not None else matches
+        if limit is None:
+            return sorted(matches, key=self._sequence_path, reverse=descending)
+        select = nlargest if descending else nsmallest
+        return select(limit, matches, key=self._sequence_path)
+
+    def _collect(self, slots: Iterable[int], is_member, ranges, stop_at: Optional[int],
+                 budget: Optional[int] = None) -> Optional[List]:
+        """
+        Gather the todos of member slots that fall within the date ranges
+
+        Args:
+            slots: Slots to check, in the order results should appear
+            is_member: Test for slots matching the bitmap facets
+            ranges: Date ranges each todo must fall within
+            stop_at: Stop once this many todos matched, or None to gather all
+            budget: Give up after visiting this many slots, or None for no limit
+
+        Returns:
+            The matching todos, or None if the budget ran out first
+        """
+        matches = []
+        for visited, slot in enumerate(slots, 1):
+            if budget is not None and visited > budget:
+                return None
+            if not is_member(slot):
+                continue
+            todo = self._todos[slot]
+            if ranges and not self._in_ranges(todo, ranges):
+                continue
+            matches.append(todo)
+            if stop_at is not None and len(matches) >= stop_at:
+                break
+        return matches
+
+    def _iter_by_sequence(self, bits: int, max_level: Optional[int] = None) -> Iterator[int]:
+        """
+        Lazily yield the slots in bits in hierarchical order. The hierarchy is walked while
+        that is cheaper than sorting the slots, then the slots not yet reached are sorted.
+        """
+        count = bits.bit_count()
+        membership = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        yielded = 0
+        for visited, slot in enumerate(self._iter_sequence_order(max_level=max_level), 1):
+            if visited > count:
+                break
+            if slot >> 3 < len(membership) and membership[slot >> 3] >> (slot & 7) & 1:
+                yielded += 1
+                yield slot
+        else:
+            return
+
+        # Everything yielded so far comes first in hierarchical order
+        ordered = sorted(iter_bits(bits), key=lambda slot: self._sequence_path(self._todos[slot]))
+        yield from ordered[yielded:]
+
+    def _in_ranges(self, todo, ranges: List[Tuple[str, Tuple[Optional[datetime], Optional[datetime]]]]) -> bool:
+        """Check a todo against date ranges not covered by the sorted index being walked"""
+        for field, (start, end) in ranges:
+            value = todo.created_at if field == "created" else todo.completed_at
+            if value is None:
+                return False
+            if start and value < start:
+                return False
+            if end and value > end:
+                return False
+        return True